@@ -0,0 +1,19 @@
+"""
+*** Cache Cloud ***
+
+Maya-free conversion engine behind the Cache Cloud script (main.py). It can be used from Python or from the command
+line, e.g. python -m cachecloud frame001.txt -o particles/myScene -n myParticleShape
+"""
+versionNum = '0.8.4'
+
+from .formats import acceptableArrayforms, arrayForm, readFrame
+from .pdc import pdcfileStep, pdcFileName, packPdc, writePdc, PdcFile, PdcSequence
+from .ncache import CacheWriter, ChannelFile, CacheSequence
+from .sequence import frameNumber, sequenceFiles
+from .filters import dropFilters, keepMask, applyMask
+from .dedupe import removeDuplicates
+from .decimate import voxelMask, decimateMask
+from .tracking import ParticleTracker
+from .stats import SequenceStats
+from .engine import makeOptions, removeZeroPoints, convertFrame, convertSequence, sequenceStats
+from .watch import SequenceWatcher, watchSequence
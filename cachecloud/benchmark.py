@@ -0,0 +1,200 @@
+"""
+Benchmarks for the conversion engine (python -m cachecloud.benchmark).
+
+Generates synthetic point cloud sequences in any of the acceptable forms of array, converts them one stage at a time
+(reading, layout detection, parsing, zero filtering, record building and PDC write) and reports the time, points per second and
+peak memory of each stage as JSON, so that runs on different machines or versions can be compared. Each sequence is
+converted in a process of its own, so that its peak memory isn't the one of the sequences before it.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import filters, formats, pdc, versionNum
+
+try:
+    import resource
+except ImportError: # Not on Windows
+    resource = None
+
+benchmarkVersion = 2 # 2: peakRss is the peak of each run, not of the whole benchmark
+stages = ['read', 'detect', 'parse', 'filter', 'records', 'write']
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Synthetic sequences
+# Writes one synthetic frame: points in [-1, 1), a zeroRatio share of them at the origin, and (for arrays of length 4)
+# integer extra values in extraRange
+def generateFrame(path, arrayFormKey, points, zeroRatio=0.0, extraRange=(0, 255), seed=0):
+    arrayFormResult = formats.acceptableArrayforms[arrayFormKey]
+    if arrayFormResult not in formats.arrayColumns:
+        raise ValueError('No synthetic data for a "{0}" form of array.'.format(arrayFormResult))
+    randomState = np.random.RandomState(seed)
+    pointCoords = randomState.uniform(-1.0, 1.0, (points, 3))
+    pointCoords[randomState.random_sample(points) < zeroRatio] = 0.0
+    posColumn, extraColumn = formats.arrayColumns[arrayFormResult]
+    columns = [pointCoords]
+    fmt = ['%.6f'] * 3
+    if extraColumn is not None:
+        extraAttrValues = randomState.randint(extraRange[0], extraRange[1] + 1, points)
+        columns.insert(0 if extraColumn == 0 else 1, extraAttrValues[:, None])
+        fmt.insert(extraColumn, '%d')
+    np.savetxt(path, np.hstack(columns), fmt=fmt, delimiter=',' if arrayFormKey.endswith('C') else ' ')
+
+# Writes a synthetic sequence (prefix0001.txt, prefix0002.txt, ...) and returns the paths of its files
+def generateSequence(directory, arrayFormKey, frames, points, zeroRatio=0.0, extraRange=(0, 255), seed=0, prefix='frame'):
+    ext = '.csv' if arrayFormKey.endswith('C') else '.txt'
+    sourceFiles = []
+    for frame in range(1, frames + 1):
+        path = os.path.join(directory, '{0}{1:04d}{2}'.format(prefix, frame, ext))
+        generateFrame(path, arrayFormKey, points, zeroRatio, extraRange, seed + frame)
+        sourceFiles.append(path)
+    return sourceFiles
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Measurements
+# Peak resident memory of this process so far, in bytes (None where it can't be known). It never goes down, so runs
+# to compare each need a process of their own (see measureRun).
+def peakRss():
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+# Converts a sequence one stage at a time, timing each stage. Returns the totals per stage.
+def timeStages(sourceFiles, outputDir, extraAttr='radiusPP', cleanup=True):
+    seconds = dict((stage, 0.0) for stage in stages)
+    pointsTotal = 0
+    bytesTotal = 0
+    for index, sourcefile in enumerate(sourceFiles):
+        start = time.perf_counter()
+        with open(sourcefile, 'r') as inFile:
+            text = inFile.read()
+        seconds['read'] += time.perf_counter() - start
+        start = time.perf_counter()
+        arrayDelimiter, arrayFormResult = formats.arrayForm(formats.sampleLines(text))[:2]
+        seconds['detect'] += time.perf_counter() - start
+        start = time.perf_counter()
+        pointCoords, extraAttrValues = formats.parseText(text, arrayDelimiter, arrayFormResult)
+        seconds['parse'] += time.perf_counter() - start
+        pointsTotal += len(pointCoords)
+        start = time.perf_counter()
+        particleIds = np.arange(len(pointCoords))
+        if cleanup:
+            pointCoords, particleIds, extraAttrValues = filters.applyMask(filters.keepMask(pointCoords, [['zero']]), pointCoords, extraAttrValues)
+        seconds['filter'] += time.perf_counter() - start
+        start = time.perf_counter()
+        packedData = pdc.packPdc(pointCoords, particleIds, extraAttr if extraAttrValues is not None else None, extraAttrValues)
+        seconds['records'] += time.perf_counter() - start
+        start = time.perf_counter()
+        outputPath = os.path.join(outputDir, pdc.pdcFileName('benchmarkShape', pdc.frameTick(index + 1, 'ntsc')))
+        with open(outputPath, 'wb') as outputPDCfile:
+            outputPDCfile.write(packedData)
+        bytesTotal += len(packedData)
+        seconds['write'] += time.perf_counter() - start
+    results = {}
+    for stage in stages:
+        results[stage] = {'seconds': seconds[stage],
+                          'pointsPerSec': pointsTotal / seconds[stage] if seconds[stage] else None}
+    return results, pointsTotal, bytesTotal
+
+# Converts a sequence with timeStages in a new process. Returns the results of timeStages, the total time, and the peak
+# resident memory of that process (an interpreter with numpy loaded, plus the conversion). Processes come from a fork
+# server where there is one: a process spawned straight from this one would count the memory this one had in its peak.
+def measureRun(sourceFiles, outputDir):
+    startMethod = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context(startMethod)) as pool:
+        return pool.submit(timedRun, sourceFiles, outputDir).result()
+
+def timedRun(sourceFiles, outputDir):
+    start = time.perf_counter()
+    stageResults, pointsTotal, bytesTotal = timeStages(sourceFiles, outputDir)
+    return stageResults, pointsTotal, bytesTotal, time.perf_counter() - start, peakRss()
+
+# Generates and converts a sequence for every combination of form of array and point count
+def runBenchmarks(arrayFormKeys, pointCounts, frames=3, zeroRatio=0.1, extraRange=(0, 255), seed=0, workDir=None, log=None):
+    runs = []
+    for arrayFormKey in arrayFormKeys:
+        for points in pointCounts:
+            tempDir = tempfile.mkdtemp(prefix='cachecloud_benchmark_', dir=workDir)
+            try:
+                outputDir = os.path.join(tempDir, 'cache')
+                os.makedirs(outputDir)
+                sourceFiles = generateSequence(tempDir, arrayFormKey, frames, points, zeroRatio, extraRange, seed)
+                stageResults, pointsTotal, bytesTotal, total, runPeakRss = measureRun(sourceFiles, outputDir)
+            finally:
+                shutil.rmtree(tempDir, ignore_errors=True)
+            run = {'arrayForm': arrayFormKey,
+                   'points': points,
+                   'frames': frames,
+                   'zeroRatio': zeroRatio,
+                   'extraRange': list(extraRange),
+                   'stages': stageResults,
+                   'seconds': total,
+                   'pointsPerSec': pointsTotal / total if total else None,
+                   'bytesWritten': bytesTotal,
+                   'peakRss': runPeakRss}
+            runs.append(run)
+            if log is not None:
+                log(run)
+    return runs
+
+# Describes where the benchmarks ran
+def environment():
+    return {'cachecloud': versionNum,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count()}
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Command line
+def printRun(run):
+    sys.stderr.write('{0:>5} {1:>9} points x {2} frames: {3:8.3f} s, {4:12,.0f} points/s ({5})\n'.format(
+        run['arrayForm'], run['points'], run['frames'], run['seconds'], run['pointsPerSec'] or 0,
+        ', '.join('{0} {1:.3f} s'.format(stage, run['stages'][stage]['seconds']) for stage in stages)))
+
+def main(argv=None):
+    arrayFormKeys = [key for key in sorted(formats.acceptableArrayforms) if key != 'u']
+    parser = argparse.ArgumentParser(prog='python -m cachecloud.benchmark',
+                                     description='Time each stage of the conversion on synthetic point cloud sequences.')
+    parser.add_argument('--layouts', nargs='+', default=arrayFormKeys, choices=arrayFormKeys, metavar='LAYOUT',
+                        help='Forms of array to generate: {0} (default: all)'.format(', '.join(arrayFormKeys)))
+    parser.add_argument('--points', nargs='+', type=int, default=[10000, 100000], help='Points per frame (default: %(default)s)')
+    parser.add_argument('--frames', type=int, default=3, help='Frames per sequence (default: %(default)s)')
+    parser.add_argument('--zero-ratio', dest='zeroRatio', type=float, default=0.1,
+                        help='Share of zero-value points (default: %(default)s)')
+    parser.add_argument('--extra-range', dest='extraRange', type=int, nargs=2, default=[0, 255], metavar=('MIN', 'MAX'),
+                        help='Range of the extra attribute values (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: %(default)s)')
+    parser.add_argument('--work-dir', dest='workDir', default=None, help='Where to write the synthetic sequences')
+    parser.add_argument('-o', '--output', default=None, help='Write the results to this JSON file instead of stdout')
+    args = parser.parse_args(argv)
+    runs = runBenchmarks(args.layouts, args.points, args.frames, args.zeroRatio, tuple(args.extraRange), args.seed,
+                         args.workDir, log=printRun)
+    results = {'version': benchmarkVersion,
+               'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+               'environment': environment(),
+               'runs': runs}
+    if args.output:
+        with open(args.output, 'w') as outFile:
+            json.dump(results, outFile, indent=1, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write('\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Command line entry point for batch conversions (python -m cachecloud).
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import argparse
+import datetime
+import os
+import sys
+
+from . import engine, metrics, ncache, pipeline, sequence, stats, versionNum, watch
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# A multiplication factor, or 'auto'
+def factorArgument(text):
+    return text if text == 'auto' else float(text)
+
+def makeParser():
+    parser = argparse.ArgumentParser(prog='cachecloud',
+                                     description='Create Maya particle disk cache (PDC) files from a sequence of point cloud data.')
+    parser.add_argument('sourceFiles', nargs='+', metavar='SOURCE',
+                        help='Point cloud data files. If only one file is given, all files in the same sequence are used.')
+    parser.add_argument('-o', '--output', dest='cacheoutputDir', required=True,
+                        help='Cache output directory (e.g. <project>/particles/<scene>)')
+    parser.add_argument('-n', '--name', dest='pdcBasename', required=True,
+                        help='Particle shape name, used for naming the PDC files')
+    parser.add_argument('-r', '--frame-rate', dest='frameRate', default=engine.defaultOptions['frameRate'],
+                        choices=['ntsc', 'pal', 'film', 'palf', 'ntscf', 'show', 'game'],
+                        help='Maya time unit (default: %(default)s)')
+    parser.add_argument('--start', type=int, default=None,
+                        help='First frame number of the sequence to convert (default: the frame of the first source file)')
+    parser.add_argument('--end', type=int, default=None, help='Last frame number of the sequence to convert')
+    parser.add_argument('--step', type=int, default=1, help='Convert every STEP frames (default: %(default)s)')
+    parser.add_argument('-f', '--first-frame', dest='firstFrame', type=int, default=None,
+                        help='Frame of the first source file (default: the frame number in its name)')
+    parser.add_argument('--remove-zeros', dest='cleanup', action='store_true',
+                        help='Remove all zero-value points')
+    parser.add_argument('--drop-near-origin', dest='nearOrigin', type=float, default=None, metavar='EPSILON',
+                        help='Remove all points within EPSILON of the origin')
+    parser.add_argument('--drop-outside-box', dest='outsideBox', type=float, nargs=6, default=None,
+                        metavar=('XMIN', 'YMIN', 'ZMIN', 'XMAX', 'YMAX', 'ZMAX'),
+                        help='Remove all points outside this axis-aligned box')
+    parser.add_argument('--scale', dest='scale', type=float, nargs=3, default=None, metavar=('X', 'Y', 'Z'),
+                        help='Scale the point coordinates along each axis')
+    parser.add_argument('--matrix', dest='matrix', type=float, nargs=16, default=None, metavar='M',
+                        help='Transform the point coordinates (once scaled) by this 4x4 matrix, given row by row as in Maya (xform -query -matrix)')
+    parser.add_argument('--offset', dest='offset', type=float, nargs=3, default=None, metavar=('X', 'Y', 'Z'),
+                        help='Move the point coordinates (once scaled and transformed) by this offset')
+    crop = parser.add_mutually_exclusive_group()
+    crop.add_argument('--crop-box', dest='cropBox', type=float, nargs=6, default=None,
+                      metavar=('XMIN', 'YMIN', 'ZMIN', 'XMAX', 'YMAX', 'ZMAX'),
+                      help='Only keep the points inside this axis-aligned box, once transformed')
+    crop.add_argument('--crop-sphere', dest='cropSphere', type=float, nargs=4, default=None, metavar=('X', 'Y', 'Z', 'RADIUS'),
+                      help='Only keep the points inside this sphere, once transformed')
+    parser.add_argument('--dedupe', dest='dedupe', type=float, nargs='?', const=0.0, default=None, metavar='TOLERANCE',
+                        help='Remove duplicate points: points in the same cell of a grid of size TOLERANCE, or with the same coordinates if no TOLERANCE is given')
+    parser.add_argument('--dedupe-extra', dest='dedupeExtra', default='first', choices=['first', 'mean'],
+                        help='Extra attribute value of a point that had duplicates: its own or their average (default: %(default)s)')
+    parser.add_argument('--track', dest='track', type=float, default=None, metavar='DISTANCE',
+                        help='Keep the particle id of the nearest point of the previous frame within DISTANCE, so particles can be followed from frame to frame (frames are converted one at a time)')
+    parser.add_argument('--velocity', action='store_true',
+                        help='With --track, also write the velocity of each particle')
+    decimation = parser.add_mutually_exclusive_group()
+    decimation.add_argument('--cell-size', dest='cellSize', type=float, default=None, metavar='SIZE',
+                            help='Decimate each frame on a voxel grid, keeping one point per cell of this size')
+    decimation.add_argument('--target-points', dest='targetPoints', type=int, default=None, metavar='N',
+                            help='Decimate each frame on a voxel grid, with cells just large enough to keep at most N points')
+    decimation.add_argument('--lod-cell-sizes', dest='lodCellSizes', type=float, nargs='+', default=None, metavar='SIZE',
+                            help='Write a level of detail for each cell size to OUTPUT_lod0, OUTPUT_lod1, ... (0 keeps every point)')
+    decimation.add_argument('--lod-points', dest='lodPoints', type=int, nargs='+', default=None, metavar='N',
+                            help='Write a level of detail for each target point count to OUTPUT_lod0, OUTPUT_lod1, ... (0 keeps every point)')
+    parser.add_argument('--extra-attr', dest='extraAttr', default=None,
+                        help='Assign the extra value of 4-value arrays to this attribute (e.g. radiusPP, opacityPP)')
+    parser.add_argument('--extra-scale', dest='extraScalefactor', type=factorArgument, default=1.0,
+                        help='Multiplication factor applied to the extra attribute values, or "auto" to bring the largest value of the whole sequence to 1')
+    parser.add_argument('--cache-format', dest='cacheFormat', default='pdc', choices=('pdc',) + ncache.cacheFormats,
+                        help='Write PDC files, or a Maya nCache (XML description and .mcx or .mcc channel data) (default: %(default)s)')
+    parser.add_argument('--one-file', dest='cacheType', action='store_const', const='OneFile', default='OneFilePerFrame',
+                        help='Write all the frames of an nCache to a single file (frames are converted one at a time)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='Number of frames converted in parallel, by separate processes. 0 uses one per CPU. (default: %(default)s)')
+    parser.add_argument('--pipeline', dest='pipelineDepth', type=int, nargs='?', const=pipeline.defaultDepth, default=0, metavar='DEPTH',
+                        help='When converting one frame at a time, read the next DEPTH source files and write the last DEPTH PDC files in the background, so disk and CPU time overlap (default DEPTH: {0})'.format(pipeline.defaultDepth))
+    parser.add_argument('--keep-going', dest='onError', action='store_const', const='continue', default='stop',
+                        help='Carry on with the other frames when a frame can\'t be converted')
+    parser.add_argument('--chunk-size', dest='chunkSize', type=float, default=0, metavar='MB',
+                        help='Read each source file in chunks of this many megabytes instead of all at once, for frames too large for memory')
+    parser.add_argument('--frame-store', dest='frameStore', nargs='?', const='', default=None, metavar='DIR',
+                        help='Keep the parsed frames in a binary store, so that runs with other settings don\'t parse the source files again (default DIR: OUTPUT/NAME.frames)')
+    parser.add_argument('--no-layout-check', dest='checkLayout', action='store_false',
+                        help='Don\'t check the form of array of every frame against the one of the first file')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='Only convert the frames whose source file or settings changed since the last run')
+    parser.add_argument('--hash', dest='hashSources', action='store_true',
+                        help='With --incremental, also compare the content of source files whose modification time changed')
+    parser.add_argument('--watch', action='store_true',
+                        help='Convert the frames of the sequence of SOURCE as they land in its directory, until --end (or until interrupted). The manifest is kept up to date, so a watch can be started again where it stopped.')
+    parser.add_argument('--poll-interval', dest='pollInterval', type=float, default=watch.defaultPollInterval, metavar='SECONDS',
+                        help='With --watch, list the source directory every SECONDS (default: %(default)s)')
+    parser.add_argument('--settle', dest='settleTime', type=float, default=watch.defaultSettleTime, metavar='SECONDS',
+                        help='With --watch, a source file is complete once it hasn\'t changed for SECONDS (default: %(default)s)')
+    parser.add_argument('--idle-timeout', dest='idleTimeout', type=float, default=None, metavar='SECONDS',
+                        help='With --watch, stop when no frame has come in for SECONDS')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help='Append timing, point counts and bytes written for each frame and stage to this JSON Lines file')
+    parser.add_argument('--progress-interval', dest='progressInterval', type=float, default=metrics.defaultInterval,
+                        metavar='SECONDS', help='Report progress at most once every SECONDS (default: %(default)s)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Only report errors')
+    return parser
+
+# Reports a frame that couldn't be converted
+def printErrors(frameInfo):
+    if 'error' in frameInfo:
+        sys.stderr.write('cachecloud: error: {0}\n'.format(frameInfo['error']))
+
+# Reports how far the conversion got (see metrics.RateLimitedProgress)
+def printStatus(status):
+    printErrors(status['frameInfo'])
+    print('// {0}{1} frames, {2:,} points, {3:,} removed{4}, {5:.1f} MB written ({6:.1f} s, {7:.1f} frames/s){8}'.format(
+        status['done'], '/{0}'.format(status['total']) if status['total'] is not None else '', status['points'], status['removed'],
+        ', {0:,} duplicates'.format(status['duplicates']) if status['duplicates'] else '', status['bytes'] / float(1 << 20),
+        status['elapsed'], status['done'] / status['elapsed'] if status['elapsed'] else 0.0,
+        ', {0} up to date'.format(status['skipped']) if status['skipped'] else ''))
+
+# Reports the statistics of the points written (see stats.SequenceStats)
+def printStats(sequenceStats):
+    summary = sequenceStats.summary()
+    if not summary['frames']:
+        return
+    print('*** {0:,} to {1:,} points per frame{2}'.format(summary['minPoints'], summary['maxPoints'],
+          ', bounding box ({0:g}, {1:g}, {2:g}) to ({3:g}, {4:g}, {5:g})'.format(*summary['boxMin'] + summary['boxMax']) if summary['boxMin'] else ''))
+    if summary.get('extra') and summary['extra']['count']:
+        print('*** Extra values (before scaling): {0:g} to {1:g}, mean {2:g}, variance {3:g}'.format(
+              summary['extra']['min'], summary['extra']['max'], summary['extra']['mean'], summary['extra']['variance']))
+
+def main(argv=None):
+    args = makeParser().parse_args(argv)
+    if args.watch and len(args.sourceFiles) > 1:
+        sys.stderr.write('cachecloud: error: --watch takes the first file of the sequence only\n')
+        return 1
+    try:
+        if args.watch:
+            frameIndex = []
+        elif len(args.sourceFiles) == 1: # If only one file was given, use all relevant files in the directory
+            frameIndex = sequence.sequenceIndex(args.sourceFiles[0], args.start, args.end, args.step)
+        else:
+            frameIndex = [(sequence.frameNumber(f), f) for f in sequence.sortByFrame(args.sourceFiles)]
+            frameIndex = sequence.selectFrames(frameIndex, args.start, args.end, args.step)
+    except (OSError, ValueError) as e:
+        sys.stderr.write('cachecloud: error: {0}\n'.format(e))
+        return 1
+    sourceFiles = [path for frame, path in frameIndex]
+    missing = sequence.missingFrames(frameIndex, args.step)
+    if missing:
+        sys.stderr.write('cachecloud: warning: {0} frames are missing from the sequence, and will be missing from the cache: {1}{2}\n'.format(
+            len(missing), ', '.join(str(frame) for frame in missing[:10]), ', ...' if len(missing) > 10 else ''))
+    dropFilters = []
+    if args.nearOrigin is not None:
+        dropFilters.append(['nearOrigin', args.nearOrigin])
+    if args.outsideBox is not None:
+        dropFilters.append(['outsideBox', args.outsideBox[:3], args.outsideBox[3:]])
+    cropSpec = ['box', args.cropBox[:3], args.cropBox[3:]] if args.cropBox else ['sphere', args.cropSphere[:3], args.cropSphere[3]] if args.cropSphere else None
+    decimateSpec = ['cellSize', args.cellSize] if args.cellSize else ['targetPoints', args.targetPoints] if args.targetPoints else None
+    lods = [['cellSize', size] if size else None for size in args.lodCellSizes or []]
+    lods += [['targetPoints', points] if points else None for points in args.lodPoints or []]
+    if args.quiet:
+        progress = printErrors
+    else:
+        print('*** Cache Cloud version {0}'.format(versionNum))
+        print(datetime.datetime.now().strftime('*** Started: %Y-%m-%d %H:%M:%S'))
+        progress = metrics.RateLimitedProgress(printStatus, None if args.watch else len(sourceFiles), args.progressInterval)
+    if args.frameStore == '':
+        args.frameStore = os.path.join(args.cacheoutputDir, args.pdcBasename + '.frames')
+    recorder = metrics.Recorder([metrics.JsonLinesSink(args.metrics)] if args.metrics else [])
+    options = dict(frameRate=args.frameRate, cleanup=args.cleanup, dropFilters=dropFilters,
+                   scale=args.scale, matrix=args.matrix, offset=args.offset, crop=cropSpec,
+                   dedupe=args.dedupe, dedupeExtra=args.dedupeExtra, track=args.track, velocity=args.velocity,
+                   decimate=decimateSpec, lods=lods, cacheFormat=args.cacheFormat, cacheType=args.cacheType,
+                   extraAttr=args.extraAttr, extraScalefactor=args.extraScalefactor,
+                   chunkSize=int(args.chunkSize * (1 << 20)), checkLayout=args.checkLayout, frameStore=args.frameStore)
+    try:
+        if args.watch:
+            if not args.quiet:
+                print('*** Watching {0} (Ctrl+C to stop)'.format(os.path.dirname(os.path.abspath(args.sourceFiles[0]))))
+            written = watch.watchSequence(args.sourceFiles[0], args.cacheoutputDir, args.pdcBasename,
+                                          firstFrame=args.firstFrame, progress=progress, onError=args.onError,
+                                          hashSources=args.hashSources, recorder=recorder, start=args.start, end=args.end,
+                                          pollInterval=args.pollInterval, settleTime=args.settleTime,
+                                          idleTimeout=args.idleTimeout, **options)
+        else:
+            written = engine.convertSequence(sourceFiles, args.cacheoutputDir, args.pdcBasename,
+                                             firstFrame=args.firstFrame, progress=progress,
+                                             workers=args.workers, onError=args.onError, pipelineDepth=args.pipelineDepth,
+                                             incremental=args.incremental, hashSources=args.hashSources, recorder=recorder,
+                                             **options)
+    except (IOError, OSError, ValueError) as e:
+        sys.stderr.write('cachecloud: error: {0}\n'.format(e))
+        return 1
+    finally:
+        recorder.close()
+    if args.watch and written and not args.quiet:
+        progress.report() # The last frames may not have been reported yet
+    failed = len([frameInfo for frameInfo in written if 'error' in frameInfo])
+    skipped = len([frameInfo for frameInfo in written if frameInfo.get('skipped')])
+    if not args.quiet:
+        outputDirs = [engine.lodDir(args.cacheoutputDir, level) for level in range(len(lods))] or [args.cacheoutputDir]
+        filesName = 'PDC files' if args.cacheFormat == 'pdc' else 'nCache frames'
+        print('*** {0} {1} have been written to {2}'.format(len(written) - failed - skipped, filesName, ', '.join(outputDirs)))
+        if skipped:
+            print('*** {0} {1} were already up to date'.format(skipped, filesName))
+        printStats(stats.SequenceStats(frameInfo['stats'] for frameInfo in written if 'stats' in frameInfo))
+    if failed:
+        sys.stderr.write('cachecloud: {0} frames could not be converted\n'.format(failed))
+        return 1
+    return 0
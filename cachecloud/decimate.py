@@ -0,0 +1,86 @@
+"""
+Voxel-grid decimation.
+
+Space is cut into cubic cells of cellSize and only the first point of each occupied cell is kept, with its particle id
+and extra attribute value. The first point of every cell is found with the hash table of dedupe.py, keyed by cell, so
+a frame is decimated in linear time, with a table the size of the frame rather than of its bounding box. A decimation is given as a spec, like the point filters:
+['cellSize', size] or ['targetPoints', count], where the cell size for a target point count is searched for.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+from . import dedupe
+
+decimateModes = ('cellSize', 'targetPoints')
+searchSteps = 10           # Bisection steps of the search for the cell size of a target point count (within 0.1%)
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Checks a decimation spec (None for no decimation), so that a bad one fails before any frame gets converted
+def checkDecimate(spec):
+    if spec is None:
+        return None
+    if len(spec) != 2 or spec[0] not in decimateModes:
+        raise ValueError('Unknown decimation: {0}. Use one of: {1}.'.format(spec, ', '.join(decimateModes)))
+    value = int(spec[1]) if spec[0] == 'targetPoints' else float(spec[1])
+    if not value > 0:
+        raise ValueError('The {0} of a decimation must be more than 0, not {1}.'.format(spec[0], spec[1]))
+    return [spec[0], value]
+
+# Cell of each point, as (N,3) integer indices from the corner of the bounding box
+def cellIndices(pointCoords, cellSize):
+    cornerMin = pointCoords.min(axis=0)
+    return np.floor((pointCoords - cornerMin) / float(cellSize)).astype(np.int64)
+
+# Mask of the first point of each occupied cell
+def voxelMask(pointCoords, cellSize):
+    if len(pointCoords) == 0:
+        return np.zeros(0, dtype=bool)
+    return dedupe.firstIndices(cellIndices(pointCoords, cellSize)) == np.arange(len(pointCoords))
+
+# Smallest cell size (within the search precision) that leaves at most targetPoints points. None if there are no more
+# points than that already.
+def targetCellSize(pointCoords, targetPoints):
+    targetPoints = int(targetPoints)
+    if len(pointCoords) <= targetPoints:
+        return None
+    extent = np.ptp(pointCoords, axis=0)
+    if not extent.any(): # All points in the same place
+        return 1.0
+    def pointsLeft(cellSize):
+        return int(np.count_nonzero(voxelMask(pointCoords, cellSize)))
+    # Start from cells of the size that would fill the bounding box (ignoring flat axes) with targetPoints points
+    extent = extent[extent > 0]
+    tooSmall = tooLarge = float(np.prod(extent) / targetPoints) ** (1.0 / len(extent))
+    while pointsLeft(tooLarge) > targetPoints:
+        tooLarge *= 2.0
+    for step in range(30):
+        if tooSmall < tooLarge and pointsLeft(tooSmall) > targetPoints:
+            break
+        tooSmall *= 0.5
+    else: # Fewer distinct positions than targetPoints
+        return tooSmall
+    for step in range(searchSteps):
+        cellSize = (tooSmall * tooLarge) ** 0.5
+        if pointsLeft(cellSize) > targetPoints:
+            tooSmall = cellSize
+        else:
+            tooLarge = cellSize
+    return tooLarge
+
+# Mask of the points kept by a decimation spec
+def decimateMask(pointCoords, spec):
+    cellSize = spec[1] if spec[0] == 'cellSize' else targetCellSize(pointCoords, spec[1])
+    if cellSize is None:
+        return np.ones(len(pointCoords), dtype=bool)
+    return voxelMask(pointCoords, cellSize)
+
+# Decimates a frame. Particle ids and extra attribute values stay with their points.
+def decimate(spec, pointCoords, particleIds, extraAttrValues=None):
+    if spec is None:
+        return pointCoords, particleIds, extraAttrValues
+    keep = decimateMask(pointCoords, spec)
+    if extraAttrValues is not None:
+        extraAttrValues = extraAttrValues[keep]
+    return pointCoords[keep], particleIds[keep], extraAttrValues
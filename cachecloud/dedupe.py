@@ -0,0 +1,80 @@
+"""
+Duplicate point removal.
+
+Points are duplicates when they have exactly the same coordinates or, with a tolerance, when they fall in the same cell
+of a grid of that size (so near-duplicates on either side of a cell boundary are both kept). Each point gets a 64-bit
+key hashed from its coordinates or cell, and points are grouped by key with a vectorized hash table, in linear time,
+instead of being compared with each other. The first point of each group is kept, with its particle id; its extra
+attribute value is either its own or the average of the group.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+extraModes = ('first', 'mean')
+hashFactors = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Checks duplicate removal options: a tolerance (None to keep duplicates, 0 for exact duplicates only) and what to do
+# with the extra attribute values of the duplicates
+def checkDedupe(tolerance, extraMode='first'):
+    if tolerance is not None and not tolerance >= 0:
+        raise ValueError('The duplicate tolerance must be 0 or more, not {0}.'.format(tolerance))
+    if extraMode not in extraModes:
+        raise ValueError('Unknown extra attribute mode for duplicates: {0}. Use one of: {1}.'.format(extraMode, ', '.join(extraModes)))
+    return tolerance, extraMode
+
+# Rows of 3 integers that two points share if and only if they're duplicates: the bits of their coordinates (with
+# -0.0 made 0.0), or the cell they fall in
+def pointCells(pointCoords, tolerance=0):
+    if tolerance:
+        return np.floor(pointCoords / float(tolerance)).astype(np.int64)
+    return np.ascontiguousarray(pointCoords + 0.0).view(np.int64)
+
+# 64-bit hash of each row of cells. Its high bits depend on all the bits of the cells, so those are the ones to use.
+def cellKeys(cells):
+    cells = cells.view(np.uint64)
+    with np.errstate(over='ignore'):
+        keys = (cells[:, 0] * hashFactors[0]) ^ (cells[:, 1] * hashFactors[1]) ^ (cells[:, 2] * hashFactors[2])
+        return (keys ^ (keys >> np.uint64(32))) * hashFactors[0]
+
+# For each row of cells, the index of the first row that's the same. Rows go in a hash table with open addressing, all
+# at a time: each round, the rows still unplaced claim their slot (the first of them in the sequence wins), rows whose
+# slot holds the same cells are placed, and the others probe the next slot.
+def firstIndices(cells):
+    rowsTotal = len(cells)
+    first = np.arange(rowsTotal)
+    if rowsTotal < 2:
+        return first
+    tableBits = int(2 * rowsTotal - 1).bit_length()
+    tableSize = 1 << tableBits
+    table = np.full(tableSize, rowsTotal, dtype=np.int64)
+    slots = (cellKeys(cells) >> np.uint64(64 - tableBits)).astype(np.int64)
+    pending = np.arange(rowsTotal)
+    while len(pending):
+        pendingSlots = slots[pending]
+        empty = table[pendingSlots] == rowsTotal
+        np.minimum.at(table, pendingSlots[empty], pending[empty])
+        owners = table[pendingSlots]
+        same = (cells[owners] == cells[pending]).all(axis=1)
+        first[pending[same]] = owners[same]
+        pending = pending[~same]
+        slots[pending] = (slots[pending] + 1) & (tableSize - 1)
+    return first
+
+# Removes duplicate points from a frame. Returns the point coordinates, particle ids and extra attribute values of the
+# points left, and the number of duplicates removed.
+def removeDuplicates(pointCoords, particleIds, extraAttrValues=None, tolerance=0, extraMode='first'):
+    first = firstIndices(pointCells(pointCoords, tolerance))
+    keep = first == np.arange(len(first))
+    duplicates = len(first) - int(np.count_nonzero(keep))
+    if not duplicates:
+        return pointCoords, particleIds, extraAttrValues, 0
+    if extraAttrValues is not None:
+        if extraMode == 'mean':
+            sums = np.bincount(first, weights=extraAttrValues, minlength=len(first))
+            extraAttrValues = sums[keep] / np.bincount(first, minlength=len(first))[keep]
+        else:
+            extraAttrValues = extraAttrValues[keep]
+    return pointCoords[keep], particleIds[keep], extraAttrValues, duplicates
@@ -0,0 +1,543 @@
+"""
+Conversion engine.
+
+Turns a sequence of point cloud data files into PDC files ("<pdcBasename>.<tick>.pdc"), one per frame, without Maya.
+The steps are the ones the Cache Cloud UI goes through: analyze the form of array of the first file, parse every file,
+optionally clean up zero-value points and scale the extra attribute, then pack and write the PDC file. The same frames
+can be written as a Maya nCache instead (see ncache.py).
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import decimate, dedupe, filters, formats, framestore, manifest, metrics, ncache, pdc, pipeline, sequence, stats, streaming, tracking, transform
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Conversion options
+defaultOptions = {'frameRate': 'ntsc',      # Maya time unit, sets the tick increment of the PDC file names
+                  'cleanup': False,         # Remove zero-value points (the 'Remove' choice of the Clean Up prompt)
+                  'dropFilters': [],        # Other point filters, as specs (see filters.dropFilters)
+                  'extraAttr': None,        # Attribute for the extra value of arrays of length 4. None skips it.
+                  'extraScalefactor': 1.0,  # Multiplication factor applied to the extra attribute values, or 'auto' to bring the largest one of the sequence to 1
+                  'scaleFactor': 1,         # Multiplication factor applied to the point coordinates
+                  'scale': None,            # Per-axis multiplication factors of the point coordinates, [x, y, z]
+                  'matrix': None,           # 4x4 affine matrix applied to the point coordinates after scaling, as in Maya (translation in the last row)
+                  'offset': None,           # Added to the point coordinates after the matrix, [x, y, z]
+                  'crop': None,             # Keep the points inside ['box', min, max] or ['sphere', center, radius], once transformed (see transform.py)
+                  'dedupe': None,           # Remove points closer than this tolerance to another one (0: exact duplicates). None keeps them.
+                  'dedupeExtra': 'first',   # Extra attribute value of a point that had duplicates: its own ('first') or their average ('mean')
+                  'track': None,            # Carry particle ids over from the nearest point of the previous frame within this distance
+                  'velocity': False,        # With track, also write the velocity of each particle (units per second)
+                  'decimate': None,         # Voxel-grid decimation, as a spec (see decimate.py). None keeps every point.
+                  'lods': [],               # Decimation specs of levels of detail, each written to its own directory (see lodDir)
+                  'cacheFormat': 'pdc',     # 'pdc' for PDC files, or 'mcx' or 'mcc' for a Maya nCache
+                  'cacheType': 'OneFilePerFrame', # nCache frames in a file each ('OneFilePerFrame') or all in one file ('OneFile')
+                  'chunkSize': 0,           # Read source files in chunks of this many characters (0 reads them whole)
+                  'frameStore': None,       # Directory of a frame store (see framestore.py) that keeps parsed frames for the next runs
+                  'checkLayout': True}      # Check the form of array of every frame against the one of the sequence
+
+# Returns a full set of conversion options, with defaults for the ones not given
+def makeOptions(**kwargs):
+    unknown = set(kwargs) - set(defaultOptions)
+    if unknown:
+        raise TypeError('Unknown conversion options: {0}'.format(', '.join(sorted(unknown))))
+    options = dict(defaultOptions)
+    options.update(kwargs)
+    options['dropFilters'] = filters.checkFilters(options['dropFilters'])
+    options['matrix'], options['scale'], options['offset'] = transform.checkTransform(options['matrix'], options['scale'], options['offset'])
+    options['crop'] = transform.checkCrop(options['crop'])
+    if options['extraScalefactor'] != 'auto':
+        options['extraScalefactor'] = float(options['extraScalefactor'])
+    options['dedupe'], options['dedupeExtra'] = dedupe.checkDedupe(options['dedupe'], options['dedupeExtra'])
+    options['track'] = tracking.checkTracking(options['track'])
+    if options['velocity'] and options['track'] is None:
+        raise ValueError('Velocities can only be written when tracking particles.')
+    options['decimate'] = decimate.checkDecimate(options['decimate'])
+    options['lods'] = [decimate.checkDecimate(spec) for spec in options['lods']]
+    if options['cacheFormat'] != 'pdc':
+        options['cacheFormat'], options['cacheType'] = ncache.checkCache(options['cacheFormat'], options['cacheType'])
+    return options
+
+# Cache output directory of a level of detail: "<cacheoutputDir>_lod<level>"
+def lodDir(cacheoutputDir, level):
+    return '{0}_lod{1}'.format(os.path.normpath(cacheoutputDir), level)
+
+# Output paths of a frame: a single path, or a list of them, one for each level of detail
+def outputPaths(outputPath):
+    return [outputPath] if isinstance(outputPath, str) else list(outputPath)
+
+# Output directories of a conversion: cacheoutputDir, or the directory of each level of detail
+def outputDirectories(cacheoutputDir, options):
+    return [lodDir(cacheoutputDir, level) for level in range(len(options['lods']))] or [cacheoutputDir]
+
+# Output path of a frame: a single path, or a list of them with levels of detail
+def frameOutputPath(outputDirs, pdcBasename, frame, options):
+    outputPath = [os.path.join(outputDir, frameFileName(pdcBasename, frame, options)) for outputDir in outputDirs]
+    return outputPath if options['lods'] else outputPath[0]
+
+# Name of the file a frame is written to: its PDC file, or its nCache channel data file
+def frameFileName(pdcBasename, frame, options):
+    if options['cacheFormat'] == 'pdc':
+        return pdc.pdcFileName(pdcBasename, pdc.frameTick(frame, options['frameRate']))
+    if options['cacheType'] == 'OneFile':
+        return ncache.cacheFileName(pdcBasename, options['cacheFormat'])
+    return ncache.frameFileName(pdcBasename, frame, options['cacheFormat'])
+
+# nCache writers of a sequence, one for each output directory. None when writing PDC files.
+def cacheWriters(outputDirs, pdcBasename, arrayFormResult, options):
+    if options['cacheFormat'] == 'pdc':
+        return None
+    extraAttr = options['extraAttr'] if formats.arrayColumns[arrayFormResult][1] is not None else None
+    return [ncache.CacheWriter(outputDir, pdcBasename, options['frameRate'], options['cacheType'], options['cacheFormat'],
+                               extraAttr, options['velocity']) for outputDir in outputDirs]
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Number of zero-value points
+def zerosCount(pointCoords):
+    return filters.dropCount(pointCoords, [['zero']])
+
+# Filters out all zero-value points. The offsets of the remaining points are used as particleIds.
+def removeZeroPoints(pointCoords, extraAttrValues=None):
+    return filters.applyMask(filters.keepMask(pointCoords, [['zero']]), pointCoords, extraAttrValues)
+
+# Point filters of a conversion: zero-value points first (if cleaning up), then the other filters. The crop comes
+# after them (see readPoints).
+def frameFilters(options):
+    return ([['zero']] if options['cleanup'] else []) + options['dropFilters']
+
+# Analyzes the form of array of a sequence from the beginning of its first file
+def analyzeSequence(sourceFiles):
+    arrayDelimiter, arrayFormResult, arrayLength = formats.sniffFile(sourceFiles[0])
+    if arrayFormResult == formats.acceptableArrayforms['u']:
+        raise ValueError('An {0} form of array was detected in "{1}".'.format(arrayFormResult, sourceFiles[0]))
+    return arrayDelimiter, arrayFormResult, arrayLength
+
+# Converts a single source file into a PDC file. Returns a summary of what was written, with the seconds spent on the
+# whole frame and on each stage: 'parse' (reading and parsing the source file), 'filter', 'dedupe', 'track', 'decimate'
+# and 'write' (packing and writing the PDC file). When reading in chunks, points are filtered as each chunk is parsed, so
+# that's all in 'parse', except for the crop (see readPoints). tracker, a tracking.ParticleTracker, is needed when
+# tracking particles (options['track']); it must be given the frames in order. With levels of detail (options['lods']), outputPath is a list of paths, one for
+# each level: the source file is read once and each level is decimated from the filtered points, then written. The
+# summary is the one of the first level, and lists every level under 'lods'. With cacheWriters (see cacheWriters()),
+# the frame goes to an nCache, one writer for each level, instead of PDC files; frame is then needed.
+def convertFrame(sourcefile, outputPath, arrayDelimiter, arrayFormResult, options, tracker=None, frame=None, cacheWriters=None):
+    timer = metrics.StageTimer()
+    frameInfo, pdcFiles = prepareFrame(sourcefile, outputPath, arrayDelimiter, arrayFormResult, options, frame, tracker, timer=timer)
+    return writeFrame(frameInfo, pdcFiles, timer, cacheWriters)
+
+# Points of a source file once filtered and without duplicates: their coordinates, particle ids and extra attribute
+# values, with the number of points read and of duplicates removed. With text, the source file isn't read again.
+# With a frame store (options['frameStore']), a source file that's in it is loaded instead of parsed ('load' stage), and
+# one that isn't is stored once parsed ('store' stage), whole even when read in chunks.
+def readPoints(sourcefile, arrayDelimiter, arrayFormResult, options, text=None, timer=None):
+    timer = timer or metrics.StageTimer()
+    filterSpecs = frameFilters(options)
+    cropAffine = transform.cropTransform(options) if options['crop'] is not None else None
+    packedCoords = None
+    storeEntry = stored = None
+    if options['frameStore']:
+        storeEntry = framestore.sourceEntry(sourcefile, arrayDelimiter, arrayFormResult)
+        stored = framestore.loadFrame(options['frameStore'], storeEntry)
+    if options['chunkSize'] and text is None and storeEntry is None:
+        pointCoords, particleIds, extraAttrValues, pointsRead = streaming.readFrameStreaming(sourcefile, arrayDelimiter, arrayFormResult, filterSpecs, options['chunkSize'], options['checkLayout'])
+        timer.lap('parse')
+        if cropAffine is not None: # On the points that passed the other filters, whose ids are offsets in the source file
+            keep, packedCoords = transform.cropPoints(pointCoords, cropAffine, options['crop'])
+            pointCoords, particleIds = pointCoords[keep], particleIds[keep]
+            extraAttrValues = None if extraAttrValues is None else extraAttrValues[keep]
+            timer.lap('filter')
+    else:
+        if stored is not None:
+            pointCoords, extraAttrValues = stored
+            timer.lap('load')
+        else:
+            if options['chunkSize'] and text is None:
+                pointCoords, particleIds, extraAttrValues, pointsRead = streaming.readFrameStreaming(sourcefile, arrayDelimiter, arrayFormResult, (), options['chunkSize'], options['checkLayout'])
+            elif text is None:
+                pointCoords, extraAttrValues = formats.readFrame(sourcefile, arrayDelimiter, arrayFormResult, options['checkLayout'])
+            else:
+                pointCoords, extraAttrValues = formats.parseFrame(sourcefile, text, arrayDelimiter, arrayFormResult, options['checkLayout'])
+            timer.lap('parse')
+            if storeEntry is not None:
+                framestore.saveFrame(options['frameStore'], storeEntry, pointCoords, extraAttrValues)
+                timer.lap('store')
+        pointsRead = len(pointCoords)
+        particleIds = np.arange(pointsRead)
+        if filterSpecs or cropAffine is not None:
+            keep = filters.keepMask(pointCoords, filterSpecs)
+            if cropAffine is not None:
+                keep, packedCoords = transform.cropPoints(pointCoords, cropAffine, options['crop'], keep)
+            pointCoords, particleIds, extraAttrValues = filters.applyMask(keep, pointCoords, extraAttrValues)
+        timer.lap('filter')
+    duplicates = 0
+    if options['dedupe'] is not None:
+        sourceIds = particleIds
+        pointCoords, particleIds, extraAttrValues, duplicates = dedupe.removeDuplicates(pointCoords, particleIds, extraAttrValues, options['dedupe'], options['dedupeExtra'])
+        if packedCoords is not None and duplicates: # Ids are increasing offsets in the source file until the points are tracked
+            packedCoords = packedCoords[np.searchsorted(sourceIds, particleIds)]
+        timer.lap('dedupe')
+    return pointCoords, particleIds, extraAttrValues, pointsRead, duplicates, packedCoords
+
+# First part of convertFrame: everything but writing the PDC files. Returns the summary of the frame, without the bytes
+# written, and the PDC files to write, as (path, pdc.writePdc arguments). The summary has the statistics of the points
+# of the frame before they're tracked, scaled, transformed or decimated (see stats.frameStats). With text, the source file isn't
+# read again.
+def prepareFrame(sourcefile, outputPath, arrayDelimiter, arrayFormResult, options, frame=None, tracker=None, text=None, timer=None):
+    timer = timer or metrics.StageTimer()
+    pointCoords, particleIds, extraAttrValues, pointsRead, duplicates, packedCoords = readPoints(sourcefile, arrayDelimiter, arrayFormResult, options, text, timer)
+    frameSummary = stats.frameStats(pointCoords, extraAttrValues)
+    timer.lap('stats')
+    velocities = None
+    if options['track'] is not None:
+        particleIds, displacement = tracker.track(pointCoords, particleIds, frame)
+        if options['velocity']:
+            velocities = displacement * pdc.framesPerSecond(options['frameRate'])
+        timer.lap('track')
+    extraAttr = options['extraAttr'] if extraAttrValues is not None else None
+    if extraAttr is not None:
+        extraAttrValues = extraAttrValues * float(options['extraScalefactor']) # Not in place: stored frames are read-only
+    pointTransform = transform.pointTransform(options) # Applied as the points are packed
+    packFactor = options['scaleFactor'] if pointTransform is None else pointTransform
+    if packedCoords is not None: # Transformed by the crop already, and packed as they are
+        if velocities is not None:
+            velocities = transform.transformVectors(velocities, packFactor)
+        packFactor = 1
+    pdcFiles = []
+    for spec, levelPath in zip(options['lods'] or [options['decimate']], outputPaths(outputPath)):
+        levelArrays = [pointCoords, particleIds, extraAttrValues, velocities, packedCoords]
+        if spec is not None:
+            keep = decimate.decimateMask(pointCoords, spec)
+            levelArrays = [None if values is None else values[keep] for values in levelArrays]
+            timer.lap('decimate')
+        levelCoords, levelIds, levelExtra, levelVelocities, levelPacked = levelArrays
+        pdcFiles.append((levelPath, (levelCoords if levelPacked is None else levelPacked, levelIds, extraAttr, levelExtra,
+                                     packFactor, levelVelocities)))
+    frameInfo = {'sourcefile': sourcefile,
+                 'outputPath': pdcFiles[0][0],
+                 'points': len(pdcFiles[0][1][0]),
+                 'removed': pointsRead - len(pointCoords) - duplicates,
+                 'duplicates': duplicates,
+                 'decimated': len(pointCoords) - len(pdcFiles[0][1][0]),
+                 'stats': frameSummary}
+    if frame is not None:
+        frameInfo['frame'] = frame
+    if options['lods']:
+        frameInfo['lods'] = [{'outputPath': levelPath, 'points': len(arrays[0])} for levelPath, arrays in pdcFiles]
+    return frameInfo, pdcFiles
+
+# Second part of convertFrame: writes the PDC files (or nCache frames) of a frame prepared by prepareFrame and completes
+# its summary
+def writeFrame(frameInfo, pdcFiles, timer, cacheWriters=None):
+    for level, (levelPath, arrays) in enumerate(pdcFiles):
+        if cacheWriters is None:
+            bytesWritten = pdc.writePdc(levelPath, *arrays)
+        else:
+            bytesWritten = cacheWriters[level].write(frameInfo['frame'], *arrays)
+        timer.lap('write')
+        if level == 0:
+            frameInfo['bytes'] = bytesWritten
+        if 'lods' in frameInfo:
+            frameInfo['lods'][level]['bytes'] = bytesWritten
+    frameInfo['seconds'] = timer.total()
+    frameInfo['stages'] = timer.seconds
+    return frameInfo
+
+# Same as convertFrame, but with onError='continue' a frame that can't be converted gives a summary with its error
+# instead of raising
+def tryConvertFrame(sourcefile, outputPath, arrayDelimiter, arrayFormResult, options, frame=None, onError='stop', tracker=None, cacheWriters=None):
+    try:
+        return convertFrame(sourcefile, outputPath, arrayDelimiter, arrayFormResult, options, tracker, frame, cacheWriters)
+    except (IOError, OSError, ValueError) as e:
+        if onError != 'continue':
+            raise
+        return {'sourcefile': sourcefile, 'outputPath': outputPaths(outputPath)[0], 'error': str(e)}
+
+# Converts frames in a pool of worker processes. Summaries are yielded in frame order, as soon as each frame and all the
+# frames before it are done. With onError='stop' the frames still pending are cancelled on the first error.
+def convertFramesParallel(jobs, workers, onError='stop', cacheWriters=None):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(tryConvertFrame, *(job + (onError, None, cacheWriters))) for job in jobs]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+# Text of the source file of a job, for a pipelined conversion. Files read in chunks, or in the frame store, are left
+# to prepareFrame.
+def readJobText(job):
+    options = job[4]
+    if options['chunkSize']:
+        return None
+    if options['frameStore'] and framestore.storedEntry(options['frameStore'], framestore.sourceEntry(job[0], job[2], job[3])):
+        return None
+    return formats.readText(job[0])
+
+# Writes the PDC files of a frame, for a pipelined conversion. A frame that failed before has nothing to write.
+def writeJobFrame(frameInfo, pdcFiles, timer, cacheWriters=None):
+    if pdcFiles is None:
+        return frameInfo
+    timer.resume() # Time spent waiting for the writer isn't part of the frame
+    return writeFrame(frameInfo, pdcFiles, timer, cacheWriters)
+
+# Converts frames serially, but with the next source files read ahead on one thread and the PDC files written behind
+# on another (see pipeline.py), at most depth frames each way. Summaries are yielded in frame order, with the time spent
+# reading as a stage of its own ('read'). With onError='stop', an error on any of the threads is raised here, after the
+# summaries of the frames before it, and the frames still in flight are dropped.
+def convertFramesPipelined(jobs, onError='stop', tracker=None, depth=pipeline.defaultDepth, cacheWriters=None):
+    def frameSummary(task, frameInfo, error):
+        if error is None:
+            return frameInfo
+        if onError != 'continue' or not isinstance(error, (IOError, OSError, ValueError)):
+            raise error
+        return {'sourcefile': task[0]['sourcefile'], 'outputPath': task[0]['outputPath'], 'error': str(error)}
+    with pipeline.ReadAhead(jobs, readJobText, depth) as reader, pipeline.BackgroundWorker(writeJobFrame, depth) as writer:
+        for job, text, readSeconds, error in reader:
+            timer = metrics.StageTimer()
+            if job[4]['chunkSize'] == 0:
+                timer.seconds['read'] = readSeconds
+            try:
+                if error is not None:
+                    raise error
+                frameInfo, pdcFiles = prepareFrame(*job, tracker=tracker, text=text, timer=timer)
+            except (IOError, OSError, ValueError) as e:
+                if onError != 'continue':
+                    raise
+                frameInfo, pdcFiles = {'sourcefile': job[0], 'outputPath': outputPaths(job[1])[0], 'error': str(e)}, None
+            writer.submit(frameInfo, pdcFiles, timer, cacheWriters)
+            for task, frameInfo, error in writer.finished():
+                yield frameSummary(task, frameInfo, error)
+        for task, frameInfo, error in writer.drain():
+            yield frameSummary(task, frameInfo, error)
+
+# Runs conversion jobs, serially or in a pool of workers, and yields their summaries in order. Particles are tracked
+# from one frame to the next, so with a tracker the jobs always run serially. Serial jobs are pipelined if
+# pipelineDepth is more than 0 (see convertFramesPipelined).
+def runJobs(jobs, workers, onError, tracker=None, pipelineDepth=0, cacheWriters=None):
+    if workers > 1 and len(jobs) > 1 and tracker is None:
+        return convertFramesParallel(jobs, min(workers, len(jobs)), onError, cacheWriters)
+    if pipelineDepth and len(jobs) > 1:
+        return convertFramesPipelined(jobs, onError, tracker, pipelineDepth, cacheWriters)
+    return (tryConvertFrame(*(job + (onError, tracker, cacheWriters))) for job in jobs)
+
+# Statistics of the points of a source file (see stats.frameStats), for a statistics pass. None if the source file
+# can't be read and onError is 'continue': converting it will fail again and report why.
+def scanFrame(sourcefile, arrayDelimiter, arrayFormResult, options, onError='stop'):
+    try:
+        pointCoords, particleIds, extraAttrValues = readPoints(sourcefile, arrayDelimiter, arrayFormResult, options)[:3]
+    except (IOError, OSError, ValueError):
+        if onError != 'continue':
+            raise
+        return None
+    return stats.frameStats(pointCoords, extraAttrValues)
+
+# Statistics of the points of every source file, in a single pass (in a pool of workers when workers > 1)
+def collectStats(sourceFiles, arrayDelimiter, arrayFormResult, options, workers=1, onError='stop'):
+    jobs = [(sourcefile, arrayDelimiter, arrayFormResult, options, onError) for sourcefile in sourceFiles]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            summaries = list(pool.map(scanFrame, *zip(*jobs)))
+    else:
+        summaries = [scanFrame(*job) for job in jobs]
+    return stats.SequenceStats(summary for summary in summaries if summary is not None)
+
+# Statistics of the frames of a sequence that are in the cache manifest already (see manifest.entryStats), by index.
+# Those frames needn't be parsed again for a statistics pass.
+def cachedStats(sourceFiles, frames, pdcBasename, arrayFormResult, options, cacheManifest):
+    settings = manifest.conversionSettings(options, arrayFormResult)
+    cached = {}
+    for index, sourcefile in enumerate(sourceFiles):
+        summary = manifest.entryStats(cacheManifest['frames'].get(frameFileName(pdcBasename, frames[index], options)), sourcefile, settings)
+        if summary is not None:
+            cached[index] = summary
+    return cached
+
+# Files written for a frame: its output file, or the one of each level of detail
+def framePaths(frameInfo):
+    return [level['outputPath'] for level in frameInfo['lods']] if 'lods' in frameInfo else [frameInfo['outputPath']]
+
+# Multiplies the extra attribute values of a file written with an extraScalefactor of 1 by factor, in place. The file
+# is then the same as if it had been written with that factor.
+def scaleWrittenExtra(path, factor, pdcBasename, options):
+    if factor == 1.0:
+        return
+    if options['cacheFormat'] == 'pdc':
+        pdc.scaleRecord(path, options['extraAttr'], factor)
+    else:
+        ncache.scaleChannel(path, '{0}_{1}'.format(pdcBasename, options['extraAttr']), factor)
+
+# Statistics of a sequence of source files, as they'd be converted with the same options (point filters, duplicate
+# removal): point counts, bounding box and extra attribute values (see stats.SequenceStats). Every file is read once;
+# with a frame store (frameStore option), the next conversion loads the frames from it instead of parsing them again.
+def sequenceStats(sourceFiles, workers=1, **kwargs):
+    options = makeOptions(**kwargs)
+    arrayDelimiter, arrayFormResult = analyzeSequence(sourceFiles)[:2]
+    return collectStats(sourceFiles, arrayDelimiter, arrayFormResult, options, workers or os.cpu_count() or 1)
+
+# Converts a sequence of source files into PDC files in cacheoutputDir. The first frame defaults to the frame number
+# of the first source file, and the other frames follow the frame numbers of their source files (see
+# sequence.outputFrames), so a missing frame or a step leaves the same gap in the cache. Each PDC file name only
+# depends on the name of its source file, so frames can be converted in any order: with workers > 1 (or 0 for one per CPU) they're spread over a pool of processes.
+# progress, if given, is called with the summary of each frame, in frame order. onError='stop' raises on the first frame
+# that can't be converted; onError='continue' carries on and reports the error in that frame's summary.
+# With incremental, frames whose PDC file is up to date according to the cache manifest (see manifest.py) are skipped,
+# and their summaries say so ('skipped'). hashSources also compares content hashes of the source files.
+# With particle tracking (options['track']), frames are converted serially, and the ids of a frame depend on all the
+# frames before it, so frames are only skipped if they're all up to date.
+# With levels of detail (options['lods']), level n is written to lodDir(cacheoutputDir, n) and the manifest goes in the
+# directory of the first level.
+# With an nCache format (options['cacheFormat']), frames go to a Maya nCache instead of PDC files, and its XML
+# description is written once the frames are done. A cache that holds every frame in one file ('OneFile') is written
+# serially and in full every time, so it's never incremental.
+# With extraScalefactor='auto', the extra attribute values of the whole sequence are scaled by the same factor, which
+# brings the largest one to 1. The statistics of frames already converted from the same sources come from the manifest;
+# the other frames are only parsed once. With a frame store, they're parsed for the statistics (see sequenceStats) and
+# loaded from the store to be converted. Without one, they're converted unscaled and their extra attribute values
+# are scaled in place once the factor is known (see scaleWrittenExtra).
+# pipelineDepth > 0 overlaps reading, converting and writing frames when they're converted serially (workers=1 or with
+# tracking), with that many frames read ahead and written behind at most. The PDC files are the same either way.
+# recorder, if given, is a metrics.Recorder that gets a record when the sequence starts, one for each frame (timing of
+# each stage, points, dropped points, bytes written) and one with the totals when it's done. It's flushed, not closed.
+def convertSequence(sourceFiles, cacheoutputDir, pdcBasename, firstFrame=None, progress=None, workers=1, onError='stop',
+                    incremental=False, hashSources=False, recorder=None, pipelineDepth=0, **kwargs):
+    options = makeOptions(**kwargs)
+    if onError not in ('stop', 'continue'):
+        raise ValueError('onError must be "stop" or "continue", not "{0}".'.format(onError))
+    if not sourceFiles:
+        return []
+    frames = sequence.outputFrames(sourceFiles, firstFrame)
+    firstFrame = frames[0]
+    outputDirs = outputDirectories(cacheoutputDir, options)
+    for outputDir in outputDirs:
+        if not os.path.exists(outputDir):
+            os.makedirs(outputDir)
+    timer = metrics.StageTimer()
+    arrayDelimiter, arrayFormResult = analyzeSequence(sourceFiles)[:2]
+    timer.lap('analyze')
+    writers = cacheWriters(outputDirs, pdcBasename, arrayFormResult, options)
+    oneFile = writers is not None and options['cacheType'] == 'OneFile'
+    manifestPath = manifest.manifestPath(outputDirs[0], pdcBasename)
+    cacheManifest = manifest.loadManifest(manifestPath, pdcBasename)
+    if not oneFile:
+        manifest.pruneMoved(cacheManifest, dict((sourcefile, frameFileName(pdcBasename, frame, options))
+                                                for sourcefile, frame in zip(sourceFiles, frames)), outputDirs)
+    tracker = tracking.ParticleTracker(options['track']) if options['track'] is not None else None
+    statsWorkers = workers or os.cpu_count() or 1
+    workers = 1 if tracker is not None or oneFile else statsWorkers
+    deferred = [] # Frames converted before the extra attribute scale factor is known, by index
+    if options['extraScalefactor'] == 'auto':
+        hasExtra = options['extraAttr'] is not None and formats.arrayColumns[arrayFormResult][1] is not None
+        cached = cachedStats(sourceFiles, frames, pdcBasename, arrayFormResult, options, cacheManifest) if hasExtra else {}
+        fresh = [index for index in range(len(sourceFiles)) if index not in cached]
+        if not hasExtra:
+            options['extraScalefactor'] = 1.0
+        elif fresh and options['frameStore']: # Parsed once for the statistics, then loaded from the store
+            sequenceSummary = collectStats([sourceFiles[index] for index in fresh], arrayDelimiter, arrayFormResult, options, statsWorkers, onError)
+            for summary in cached.values():
+                sequenceSummary.add(summary)
+            options['extraScalefactor'] = sequenceSummary.normalizeFactor()
+        elif fresh: # Converted unscaled, and scaled in place once the factor is known (see scaleWrittenExtra)
+            deferred = list(range(len(sourceFiles))) if tracker is not None or oneFile else fresh
+        else:
+            options['extraScalefactor'] = stats.SequenceStats(cached.values()).normalizeFactor()
+        timer.lap('stats')
+    done = {}
+    results = None
+    written = []
+    started = False
+    try:
+        if deferred:
+            unscaled = dict(options, extraScalefactor=1.0)
+            results = runJobs([(sourceFiles[index], frameOutputPath(outputDirs, pdcBasename, frames[index], options), arrayDelimiter,
+                                arrayFormResult, unscaled, frames[index]) for index in deferred], workers, onError, tracker, pipelineDepth, writers)
+            for index in deferred:
+                done[index] = next(results)
+            if hasattr(results, 'close'):
+                results.close()
+            if oneFile:
+                for writer in writers:
+                    writer.close() # The single file must be complete before its values are scaled
+            sequenceSummary = stats.SequenceStats(cached.values())
+            for frameInfo in done.values():
+                if 'stats' in frameInfo:
+                    sequenceSummary.add(frameInfo['stats'])
+            options['extraScalefactor'] = sequenceSummary.normalizeFactor()
+            for path in set(path for frameInfo in done.values() if 'error' not in frameInfo for path in framePaths(frameInfo)):
+                scaleWrittenExtra(path, options['extraScalefactor'], pdcBasename, options)
+        settings = manifest.conversionSettings(options, arrayFormResult)
+        allJobs = []
+        skipped = {}
+        for index, sourcefile in enumerate(sourceFiles):
+            outputPath = frameOutputPath(outputDirs, pdcBasename, frames[index], options)
+            entry = cacheManifest['frames'].get(os.path.basename(outputPaths(outputPath)[0]))
+            if index in done:
+                continue
+            if incremental and not oneFile and manifest.isUpToDate(entry, sourcefile, outputPath, settings, hashSources):
+                skipped[index] = {'sourcefile': sourcefile, 'outputPath': outputPaths(outputPath)[0], 'skipped': True,
+                                  'points': entry['points'], 'removed': entry['removed'], 'bytes': entry['bytes']}
+                if 'stats' in entry:
+                    skipped[index]['stats'] = entry['stats']
+            allJobs.append((index, (sourcefile, outputPath, arrayDelimiter, arrayFormResult, options, frames[index])))
+        jobs = [job for index, job in allJobs if index not in skipped]
+        if tracker is not None and jobs and skipped: # The ids of every frame depend on all the frames before it
+            jobs, skipped = [job for index, job in allJobs], {}
+        if recorder is not None:
+            recorder.record('sequenceStart', pdcBasename=pdcBasename, cacheoutputDir=cacheoutputDir, outputDirs=outputDirs,
+                            frames=len(sourceFiles), firstFrame=firstFrame, arrayForm=arrayFormResult,
+                            workers=workers, pipelineDepth=pipelineDepth, settings=settings,
+                            analyzeSeconds=timer.seconds['analyze'], statsSeconds=timer.seconds.get('stats'))
+            started = True
+        results = runJobs(jobs, workers, onError, tracker, pipelineDepth, writers)
+        for index in range(len(sourceFiles)):
+            frameInfo = done[index] if index in done else skipped[index] if index in skipped else next(results)
+            if writers is not None and 'error' not in frameInfo: # Frames written by other processes, or up to date
+                for writer in writers:
+                    writer.frames.add(frames[index])
+            if oneFile: # Every frame goes to the same file, which the manifest doesn't keep track of
+                pass
+            elif not frameInfo.get('skipped') and 'error' not in frameInfo:
+                cacheManifest['frames'][os.path.basename(frameInfo['outputPath'])] = manifest.frameEntry(frameInfo, settings, hashSources)
+            elif 'error' in frameInfo:
+                cacheManifest['frames'].pop(os.path.basename(frameInfo['outputPath']), None)
+            written.append(frameInfo)
+            if recorder is not None:
+                recorder.record('frame', **metrics.frameRecord(index, frameInfo))
+            if progress is not None:
+                progress(frameInfo)
+    finally:
+        if hasattr(results, 'close'): # Stops the threads of a pipelined conversion before its files are closed
+            results.close()
+        for writer in writers or []:
+            writer.close()
+        manifest.saveManifest(manifestPath, cacheManifest) # Also keeps track of the frames done before an error
+        if started:
+            recordSequenceEnd(recorder, pdcBasename, written, len(sourceFiles), timer)
+    return written
+
+# Records the totals of a sequence, including the frames that were never converted because of an error
+def recordSequenceEnd(recorder, pdcBasename, written, framesTotal, timer):
+    timer.lap('convert')
+    converted = [frameInfo for frameInfo in written if not frameInfo.get('skipped') and 'error' not in frameInfo]
+    pointsTotal = sum(frameInfo['points'] + frameInfo['removed'] + frameInfo['duplicates'] + frameInfo['decimated'] for frameInfo in converted)
+    stages = {}
+    for frameInfo in converted:
+        for stage, seconds in frameInfo['stages'].items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    recorder.record('sequenceEnd', pdcBasename=pdcBasename, frames=framesTotal, converted=len(converted),
+                    skipped=len([frameInfo for frameInfo in written if frameInfo.get('skipped')]),
+                    errors=len([frameInfo for frameInfo in written if 'error' in frameInfo]),
+                    unfinished=framesTotal - len(written),
+                    points=sum(frameInfo['points'] for frameInfo in converted),
+                    removed=sum(frameInfo['removed'] for frameInfo in converted),
+                    duplicates=sum(frameInfo['duplicates'] for frameInfo in converted),
+                    decimated=sum(frameInfo['decimated'] for frameInfo in converted),
+                    bytes=sum(frameInfo['bytes'] for frameInfo in converted),
+                    seconds=timer.total(), stages=stages,
+                    stats=stats.SequenceStats(frameInfo['stats'] for frameInfo in written if 'stats' in frameInfo).summary(),
+                    pointsPerSec=pointsTotal / timer.seconds['convert'] if timer.seconds['convert'] else None)
+    recorder.flush()
@@ -0,0 +1,56 @@
+"""
+Point filters.
+
+A filter drops points from a frame. It is given as a spec, [name, arguments...], where name is one of dropFilters
+(for example ['nearOrigin', 0.001] or ['outsideBox', [-1, -1, 0], [1, 1, 2]]), so that it can be passed around with the
+other conversion options. All the filters of a frame are combined into a single keep-mask, which is then used for the
+point coordinates, the particle ids and the extra attribute values.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Drop predicates. Each one takes the (N,3) array of point coordinates and returns a mask of the points to drop.
+# Zero-value points: all three coordinates are exactly zero
+def zero(pointCoords):
+    return ~pointCoords.any(axis=1)
+
+# Points within epsilon of the origin
+def nearOrigin(pointCoords, epsilon):
+    return np.einsum('ij,ij->i', pointCoords, pointCoords) <= float(epsilon)**2
+
+# Points outside the axis-aligned box from boxMin to boxMax
+def outsideBox(pointCoords, boxMin, boxMax):
+    return ((pointCoords < np.asarray(boxMin, dtype=np.float64)) | (pointCoords > np.asarray(boxMax, dtype=np.float64))).any(axis=1)
+
+dropFilters = {'zero': zero,
+               'nearOrigin': nearOrigin,
+               'outsideBox': outsideBox}
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Checks a list of filter specs, so that a bad one fails before any frame gets converted
+def checkFilters(filterSpecs):
+    for spec in filterSpecs:
+        if not spec or spec[0] not in dropFilters:
+            raise ValueError('Unknown point filter: {0}. Use one of: {1}.'.format(spec, ', '.join(sorted(dropFilters))))
+    return [list(spec) for spec in filterSpecs]
+
+# Mask of the points that pass all filters
+def keepMask(pointCoords, filterSpecs):
+    drop = np.zeros(len(pointCoords), dtype=bool)
+    for spec in filterSpecs:
+        drop |= dropFilters[spec[0]](pointCoords, *spec[1:])
+    return ~drop
+
+# Applies a keep-mask to a frame. The offset of each remaining point in the source file is used as its particleId.
+def applyMask(keep, pointCoords, extraAttrValues=None):
+    particleIds = np.flatnonzero(keep)
+    if extraAttrValues is not None:
+        extraAttrValues = extraAttrValues[keep]
+    return pointCoords[keep], particleIds, extraAttrValues
+
+# Number of points a frame loses to the filters
+def dropCount(pointCoords, filterSpecs):
+    return len(pointCoords) - int(np.count_nonzero(keepMask(pointCoords, filterSpecs)))
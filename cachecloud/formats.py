@@ -0,0 +1,239 @@
+"""
+Point cloud source formats.
+
+Detects the form of array used in a point cloud data file (see acceptableArrayforms) and parses its lines into point
+coordinates and extra attribute values. Source files compressed with gzip, bzip2 or xz (e.g. "frame0001.csv.gz") are
+decompressed as they're read. Nothing in here depends on Maya.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import bz2
+import gzip
+import lzma
+import os
+
+from zlib import error as zlibError
+
+import numpy as np
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Forms of array
+acceptableArrayforms = {'i3fC': 'int, float, float, float',
+                        '3fiC': 'float, float, float, int',
+                        '3fC': 'float, float, float',
+                        'i3f': 'int float float float',
+                        '3fi': 'float float float int',
+                        '3f': 'float float float',
+                        'u': 'unknown'}
+
+# Column of the first coordinate and of the extra attribute (None if there isn't one) for each form of array
+arrayColumns = {acceptableArrayforms['i3fC']: (1, 0),
+                acceptableArrayforms['3fiC']: (0, 3),
+                acceptableArrayforms['3fC']: (0, None),
+                acceptableArrayforms['i3f']: (1, 0),
+                acceptableArrayforms['3fi']: (0, 3),
+                acceptableArrayforms['3f']: (0, None)}
+
+arraySeparators = {'commas': ',', 'spaces': ' '}
+
+# Compressed source files: extension, magic bytes at the beginning of the file, and function that opens them
+compressions = {'gzip': ('.gz', b'\x1f\x8b', gzip.open),
+                'bzip2': ('.bz2', b'BZh', bz2.open),
+                'xz': ('.xz', b'\xfd7zXZ\x00', lzma.open)}
+compressedExtensions = tuple(extension for extension, magic, opener in compressions.values())
+
+commentMarkers = ('#', '//', '%')
+sampleCount = 32 # Lines analyzed to find the form of array
+sampleSize = 1 << 16 # Characters read from the beginning of a source file to find its form of array
+sniffCache = {}
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Checking the numerical contents of a string without changing the type
+def checkNum(strContent):
+    t = strContent.strip()
+    if t.isdigit():
+        return 'integer'
+    else:
+        return 'float'
+
+# Splits a line of data into its values, or returns None if it isn't a line of data (blank, comment or header row)
+def lineValues(line):
+    line = line.strip()
+    if not line or line.startswith(commentMarkers):
+        return None
+    arrayDelimiter = 'commas' if ',' in line else 'spaces'
+    pointData = [v.strip() for v in line.split(',')] if arrayDelimiter == 'commas' else line.split()
+    try:
+        [float(v) for v in pointData]
+    except ValueError:
+        return None
+    return arrayDelimiter, pointData
+
+# For data structure (i.e. form of array) analysis. Returns the delimiter, the form of array and the array length.
+# Up to sampleCount lines, spread over the whole content, are analyzed. Blank lines, comments and header rows are left
+# out, and all the lines analyzed must have the same delimiter and number of values. With 4 values, the extra value is
+# taken to be the first one if it's an integer in every line analyzed, and the last one otherwise.
+def arrayForm(contentSampling, sampleCount=sampleCount):
+    step = max(len(contentSampling) // sampleCount, 1)
+    samples = [lineValues(line) for line in contentSampling[::step]]
+    samples = [sample for sample in samples if sample is not None]
+    if not samples:
+        return None, acceptableArrayforms['u'], None
+    arrayDelimiter, pointData = samples[0]
+    arrayLength = len(pointData)
+    if any(sample[0] != arrayDelimiter or len(sample[1]) != arrayLength for sample in samples):
+        return None, acceptableArrayforms['u'], None
+    suffix = 'C' if arrayDelimiter == 'commas' else ''
+    if arrayLength == 3:
+        return arrayDelimiter, acceptableArrayforms['3f' + suffix], 3
+    elif arrayLength == 4:
+        if all(checkNum(sample[1][0]) == 'integer' for sample in samples):
+            return arrayDelimiter, acceptableArrayforms['i3f' + suffix], 4
+        return arrayDelimiter, acceptableArrayforms['3fi' + suffix], 4
+    return None, acceptableArrayforms['u'], None
+
+# Removes what isn't data from the text of a source file: comment lines, and (with skipHeader) the header rows before
+# the first line of data. Text without any of them is returned as is, without looking at every line.
+def stripNonData(text, skipHeader=True):
+    if skipHeader:
+        start = 0
+        while start < len(text):
+            lineEnd = text.find('\n', start)
+            lineEnd = len(text) if lineEnd < 0 else lineEnd + 1
+            if lineValues(text[start:lineEnd]) is not None:
+                break
+            start = lineEnd
+        text = text[start:]
+    if any(marker in text for marker in commentMarkers):
+        text = '\n'.join(line for line in text.split('\n') if not line.lstrip().startswith(commentMarkers))
+    return text
+
+# Number of values on each line of data of some text (blank lines left out), counted with numpy over the bytes of the
+# text rather than line by line
+def lineValueCounts(text):
+    data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    newlines = data == ord('\n')
+    separators = newlines | (data == ord(' ')) | (data == ord('\t')) | (data == ord('\r'))
+    valueStarts = np.flatnonzero(~separators & np.concatenate(([True], separators[:-1])))
+    lines = np.searchsorted(np.flatnonzero(newlines), valueStarts)
+    counts = np.bincount(lines)
+    return counts[counts > 0]
+
+# Parses the text of a whole source file into a contiguous (N,3) array of point coordinates, and a (N,) array of extra
+# attribute values for arrays of length 4 (None otherwise). All values are parsed in one go by numpy, without making
+# Python objects for every point. Comment lines and header rows are left out (see stripNonData). Every line of data must
+# have arrayLength values, so that a short or long line can't shift the values of the next ones into other columns.
+def parseText(text, arrayDelimiter, arrayFormResult, skipHeader=True):
+    if arrayFormResult not in arrayColumns or arrayDelimiter not in arraySeparators:
+        raise ValueError('An {0} form of array was detected.'.format(arrayFormResult))
+    posColumn, extraColumn = arrayColumns[arrayFormResult]
+    arrayLength = 3 if extraColumn is None else 4
+    text = stripNonData(text, skipHeader)
+    if arrayDelimiter == 'commas':
+        text = text.replace(',', ' ')
+    if text.strip():
+        try:
+            values = np.fromstring(text, dtype=np.float64, sep=' ')
+        except ValueError:
+            values = None
+        if values is None or values.size % arrayLength:
+            raise ValueError('The data could not be read as "{0}" arrays.'.format(arrayFormResult))
+        counts = lineValueCounts(text)
+        wrongCounts = counts[counts != arrayLength]
+        if len(wrongCounts):
+            raise ValueError('The data could not be read as "{0}" arrays: a line has {1} values instead of {2}.'.format(arrayFormResult, wrongCounts[0], arrayLength))
+        if counts.sum() != values.size:
+            raise ValueError('The data could not be read as "{0}" arrays.'.format(arrayFormResult))
+    else:
+        values = np.empty(0, dtype=np.float64)
+    values = values.reshape(-1, arrayLength)
+    if extraColumn is None:
+        return values, None
+    return np.ascontiguousarray(values[:, posColumn:posColumn + 3]), values[:, extraColumn].copy()
+
+# Same as parseText, for the lines of a source file
+def parseLines(content, arrayDelimiter, arrayFormResult):
+    return parseText('\n'.join(content), arrayDelimiter, arrayFormResult)
+
+# Lines of the sample of text a form of array is analyzed from. If the text was cut at size characters, its last line
+# might be incomplete and is left out.
+def sampleLines(text, size=sampleSize):
+    content = text[:size].split('\n')
+    if len(text) > size and len(content) > 1:
+        del content[-1]
+    return content
+
+# Compression of a source file (a key of compressions), from its extension or else its first bytes. None if it isn't
+# compressed.
+def compression(sourcefile):
+    sourcefile = str(sourcefile)
+    for name, (extension, magic, opener) in compressions.items():
+        if sourcefile.lower().endswith(extension):
+            return name
+    with open(sourcefile, 'rb') as inFile:
+        head = inFile.read(max(len(magic) for extension, magic, opener in compressions.values()))
+    for name, (extension, magic, opener) in compressions.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+# Opens a source file as text, decompressing it on the fly if it's compressed
+def openSource(sourcefile):
+    name = compression(sourcefile)
+    if name is None:
+        return open(str(sourcefile), 'r')
+    return compressions[name][2](str(sourcefile), 'rt')
+
+# Reads up to size characters (all of them if size is -1) from a source file opened with openSource. Compressed data
+# that is corrupt or cut short raises a ValueError, like any other bad source file.
+def readSource(inFile, sourcefile, size=-1):
+    try:
+        return inFile.read(size)
+    except (EOFError, lzma.LZMAError, zlibError) as e:
+        raise ValueError('"{0}": the compressed data is corrupt or incomplete ({1}).'.format(sourcefile, e))
+
+# Reads the lines of a source file. With a size, only the complete lines within its first size characters are read.
+def readContent(sourcefile, size=None):
+    with openSource(sourcefile) as inFile:
+        if size is None:
+            return readSource(inFile, sourcefile).split('\n')
+        return sampleLines(readSource(inFile, sourcefile, size + 1), size)
+
+# Form of array of a source file, analyzed from its first sampleSize characters. Results are kept for as long as the
+# file doesn't change, so asking again for the same file (e.g. once per sequence and once per frame) is cheap.
+def sniffFile(sourcefile, size=sampleSize):
+    stat = os.stat(str(sourcefile))
+    key = (os.path.abspath(str(sourcefile)), stat.st_size, stat.st_mtime_ns, size)
+    if key not in sniffCache:
+        if len(sniffCache) >= 4096:
+            sniffCache.clear()
+        sniffCache[key] = arrayForm(readContent(sourcefile, size))
+    return sniffCache[key]
+
+# Checks that the text of a source file has the form of array it is about to be parsed as
+def checkArrayForm(sourcefile, text, arrayDelimiter, arrayFormResult):
+    detected = arrayForm(sampleLines(text))
+    if detected[:2] != (arrayDelimiter, arrayFormResult):
+        raise ValueError('"{0}" has "{1}" arrays, not "{2}" like the rest of the sequence.'.format(sourcefile, detected[1], arrayFormResult))
+
+# Reads and parses a source file. The form of array is analyzed from the file itself unless it is given. With
+# checkLayout, a given form of array is checked against the file first.
+def readFrame(sourcefile, arrayDelimiter=None, arrayFormResult=None, checkLayout=False):
+    return parseFrame(sourcefile, readText(sourcefile), arrayDelimiter, arrayFormResult, checkLayout)
+
+# Whole text of a source file
+def readText(sourcefile):
+    with openSource(sourcefile) as inFile:
+        return readSource(inFile, sourcefile)
+
+# Parses the text of a source file that has already been read (see readFrame)
+def parseFrame(sourcefile, text, arrayDelimiter=None, arrayFormResult=None, checkLayout=False):
+    if arrayFormResult is None:
+        arrayDelimiter, arrayFormResult = arrayForm(sampleLines(text))[:2]
+    elif checkLayout:
+        checkArrayForm(sourcefile, text, arrayDelimiter, arrayFormResult)
+    try:
+        return parseText(text, arrayDelimiter, arrayFormResult)
+    except ValueError as e:
+        raise ValueError('"{0}": {1}'.format(sourcefile, e))
@@ -0,0 +1,82 @@
+"""
+Binary frame store.
+
+Parsing text is the main cost of a conversion, and a source file gives the same arrays every time it's parsed. A frame
+store is a directory that keeps the parsed point coordinates and extra attribute values of each source file as .npy
+files, memory-mapped when they're read back, with a small JSON index entry: the source file's path, size and
+modification time, and the form of array it was parsed with. Runs with other settings (scale factors, extra attribute,
+filters, output format...) load the arrays instead of parsing the source file again, until the source file changes.
+Arrays are stored before any point is filtered out, so every setting can be applied to them.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import hashlib
+import json
+import os
+
+import numpy as np
+
+storeVersion = 1
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Index entry, point coordinates and extra attribute values files of a source file in a store
+def entryPaths(storeDir, sourcefile):
+    key = hashlib.sha1(os.path.abspath(str(sourcefile)).encode('utf-8')).hexdigest()
+    return [os.path.join(storeDir, key + suffix) for suffix in ('.json', '.coords.npy', '.extra.npy')]
+
+# What a stored frame must have been made from to be up to date: the source file as it is now, parsed with this form
+# of array. Taken before the source file is read, so that a change while it's parsed leaves the store out of date.
+def sourceEntry(sourcefile, arrayDelimiter, arrayFormResult):
+    stat = os.stat(str(sourcefile))
+    return {'version': storeVersion, 'source': os.path.abspath(str(sourcefile)), 'size': stat.st_size,
+            'mtime': stat.st_mtime_ns, 'arrayDelimiter': arrayDelimiter, 'arrayForm': arrayFormResult}
+
+# Stored index entry of a source file, if it's up to date with entry (see sourceEntry). None otherwise.
+def storedEntry(storeDir, entry):
+    try:
+        with open(entryPaths(storeDir, entry['source'])[0], 'r') as inFile:
+            stored = json.load(inFile)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(stored, dict) or any(stored.get(key) != value for key, value in entry.items()):
+        return None
+    return stored
+
+# Point coordinates and extra attribute values (None if there aren't any) of a source file, as read-only arrays mapped
+# from the store. None if the store has no up-to-date frame for it.
+def loadFrame(storeDir, entry):
+    stored = storedEntry(storeDir, entry)
+    if stored is None:
+        return None
+    indexPath, coordsPath, extraPath = entryPaths(storeDir, entry['source'])
+    mmapMode = 'r' if stored['points'] else None # Empty arrays can't be mapped
+    try:
+        pointCoords = np.load(coordsPath, mmap_mode=mmapMode)
+        extraAttrValues = np.load(extraPath, mmap_mode=mmapMode) if stored['extra'] else None
+    except (IOError, OSError, ValueError):
+        return None
+    if pointCoords.shape != (stored['points'], 3) or (extraAttrValues is not None and extraAttrValues.shape != (stored['points'],)):
+        return None
+    return pointCoords, extraAttrValues
+
+# Writes the arrays of a source file to the store. Each file goes through a temporary file, and the index entry is
+# written last, so an interrupted write (or another process storing the same file) never leaves a frame that looks
+# complete but isn't.
+def saveFrame(storeDir, entry, pointCoords, extraAttrValues=None):
+    if not os.path.exists(storeDir):
+        os.makedirs(storeDir, exist_ok=True)
+    indexPath, coordsPath, extraPath = entryPaths(storeDir, entry['source'])
+    tempSuffix = '.{0}.tmp'.format(os.getpid())
+    arrays = [(coordsPath, np.asarray(pointCoords, dtype=np.float64))]
+    if extraAttrValues is not None:
+        arrays.append((extraPath, np.asarray(extraAttrValues, dtype=np.float64)))
+    for path, values in arrays:
+        with open(path + tempSuffix, 'wb') as outFile:
+            np.save(outFile, values)
+        os.replace(path + tempSuffix, path)
+    stored = dict(entry, points=len(pointCoords), extra=extraAttrValues is not None)
+    with open(indexPath + tempSuffix, 'w') as outFile:
+        json.dump(stored, outFile, sort_keys=True)
+    os.replace(indexPath + tempSuffix, indexPath)
+    return stored
@@ -0,0 +1,131 @@
+"""
+Cache manifest for incremental conversions.
+
+A JSON file in the cache output directory records, for every PDC file written, the source file it came from (size,
+modification time and, optionally, a content hash), the form of array and the conversion settings used. On the next
+run, frames whose source and settings haven't changed since are left as they are.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import hashlib
+import json
+import os
+
+manifestVersion = 1
+# Options that only change how a conversion runs, not the PDC files it writes
+runOptions = ('chunkSize', 'checkLayout', 'frameStore')
+# Settings that the statistics of a frame depend on (see stats.frameStats): the ones that choose which points are kept
+statsSettings = ('arrayForm', 'cleanup', 'dropFilters', 'scaleFactor', 'scale', 'matrix', 'offset', 'crop', 'dedupe', 'dedupeExtra')
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Path of the manifest of a particle shape's cache
+def manifestPath(cacheoutputDir, pdcBasename):
+    return os.path.join(cacheoutputDir, pdcBasename + '.cachecloud.json')
+
+def emptyManifest(pdcBasename):
+    return {'version': manifestVersion, 'pdcBasename': pdcBasename, 'frames': {}}
+
+# Reads a manifest. A missing, unreadable or outdated manifest is treated as empty, so everything gets converted again.
+def loadManifest(path, pdcBasename):
+    try:
+        with open(path, 'r') as inFile:
+            manifest = json.load(inFile)
+    except (IOError, OSError, ValueError):
+        return emptyManifest(pdcBasename)
+    if not isinstance(manifest, dict) or manifest.get('version') != manifestVersion or not isinstance(manifest.get('frames'), dict):
+        return emptyManifest(pdcBasename)
+    return manifest
+
+# Writes a manifest through a temporary file, so that an interrupted run never leaves half a manifest behind
+def saveManifest(path, manifest):
+    tempPath = path + '.tmp'
+    with open(tempPath, 'w') as outFile:
+        json.dump(manifest, outFile, indent=1, sort_keys=True)
+    os.replace(tempPath, path)
+
+# Content hash of a file
+def fileHash(path, blockSize=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as inFile:
+        for block in iter(lambda: inFile.read(blockSize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Size and modification time of a source file
+def sourceStamp(sourcefile):
+    stat = os.stat(sourcefile)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+# Conversion settings as stored in the manifest: the options that change the output, and the form of array
+def conversionSettings(options, arrayFormResult):
+    settings = dict((key, value) for key, value in options.items() if key not in runOptions)
+    settings['arrayForm'] = arrayFormResult
+    return json.loads(json.dumps(settings, sort_keys=True)) # Same types as when read back from the manifest
+
+# Checks whether the PDC file at outputPath (or the ones of every level of detail, if it's a list of paths) is up to
+# date with its source file. With hashSources, a source file whose
+# size or modification time changed is still up to date if its content hash is the same. (The entry gets the new
+# modification time, so the hash isn't needed again next time.)
+def isUpToDate(entry, sourcefile, outputPath, settings, hashSources=False):
+    if not entry or entry.get('settings') != settings or entry.get('source') != os.path.abspath(sourcefile):
+        return False
+    outputPaths = [outputPath] if isinstance(outputPath, str) else list(outputPath)
+    try:
+        if [os.path.getsize(path) for path in outputPaths] != entry.get('lodBytes', [entry.get('bytes')]):
+            return False
+        stamp = sourceStamp(sourcefile)
+    except OSError:
+        return False
+    if stamp['size'] == entry.get('size') and stamp['mtime'] == entry.get('mtime'):
+        return True
+    if hashSources and entry.get('hash') and stamp['size'] == entry.get('size') and fileHash(sourcefile) == entry['hash']:
+        entry['mtime'] = stamp['mtime']
+        return True
+    return False
+
+# Statistics of the points of a frame, from its manifest entry, if its source file is the same and its points were kept
+# the same way (see statsSettings). None otherwise. They don't depend on the file written, which may be out of date.
+def entryStats(entry, sourcefile, settings):
+    if not entry or 'stats' not in entry or entry.get('source') != os.path.abspath(sourcefile):
+        return None
+    if any(entry.get('settings', {}).get(key) != settings.get(key) for key in statsSettings):
+        return None
+    try:
+        stamp = sourceStamp(sourcefile)
+    except OSError:
+        return None
+    if stamp['size'] != entry.get('size') or stamp['mtime'] != entry.get('mtime'):
+        return None
+    return entry['stats']
+
+# Drops the entries of source files that now go to another file (e.g. after the first frame changed), given as a dict
+# of source file: name of the file it goes to, and deletes the files they were written to from outputDirs, so no stale
+# frame is left in the cache. Returns the names of the files deleted.
+def pruneMoved(manifest, frameFiles, outputDirs):
+    frameFiles = dict((os.path.abspath(sourcefile), fileName) for sourcefile, fileName in frameFiles.items())
+    moved = [fileName for fileName, entry in manifest['frames'].items()
+             if entry.get('source') in frameFiles and frameFiles[entry['source']] != fileName]
+    for fileName in moved:
+        del manifest['frames'][fileName]
+        for outputDir in outputDirs:
+            path = os.path.join(outputDir, fileName)
+            if os.path.isfile(path):
+                os.remove(path)
+    return moved
+
+# Manifest entry for a frame that was just written
+def frameEntry(frameInfo, settings, hashSources=False):
+    entry = sourceStamp(frameInfo['sourcefile'])
+    entry.update({'source': os.path.abspath(frameInfo['sourcefile']),
+                  'settings': settings,
+                  'points': frameInfo['points'],
+                  'removed': frameInfo['removed'],
+                  'bytes': frameInfo['bytes']})
+    if 'stats' in frameInfo:
+        entry['stats'] = frameInfo['stats']
+    if 'lods' in frameInfo:
+        entry['lodBytes'] = [level['bytes'] for level in frameInfo['lods']]
+    if hashSources:
+        entry['hash'] = fileHash(frameInfo['sourcefile'])
+    return entry
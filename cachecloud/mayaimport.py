@@ -0,0 +1,37 @@
+"""
+Single point cloud import into Maya.
+
+Creates a particle object from a frame's arrays with a handful of Maya commands, whatever the number of points: the
+positions go in with the particle command that creates the object, and each per-particle attribute is set as a whole
+array with one setAttr call (for the attribute and for its initial state), instead of one particle edit per point.
+maya.cmds is only imported when no cmds module is given, so this can also run against a stand-in for it.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+def mayaCmds(cmds=None):
+    if cmds is None:
+        import maya.cmds as cmds
+    return cmds
+
+# Sets a per-particle double array attribute (and its initial state, attr + '0') on a particle shape, adding the
+# attributes first if the shape doesn't have them yet
+def setParticleAttr(particleShape, attr, values, cmds=None):
+    cmds = mayaCmds(cmds)
+    values = np.asarray(values, dtype=np.float64).tolist()
+    for name in (attr, attr + '0'):
+        if not cmds.attributeQuery(name, node=particleShape, exists=True):
+            cmds.addAttr(particleShape, ln=name, dt='doubleArray')
+        cmds.setAttr(particleShape + '.' + name, values, type='doubleArray')
+
+# Creates a particle object named particlesName with a particle at each point. Extra attribute values, if given, are
+# set on the particles in the same order as the points. Returns the particle shape name.
+def importPointCloud(particlesName, pointCoords, extraAttr=None, extraAttrValues=None, cmds=None):
+    cmds = mayaCmds(cmds)
+    particleShape = cmds.particle(n=particlesName, position=[tuple(p) for p in pointCoords.tolist()])[1]
+    if extraAttr is not None and extraAttrValues is not None:
+        setParticleAttr(particleShape, extraAttr, extraAttrValues, cmds)
+    return particleShape
@@ -0,0 +1,145 @@
+"""
+Conversion metrics.
+
+A Recorder collects structured records (one dict per event: a sequence starting, a frame written, a sequence done)
+with the timing of each stage, point counts, dropped points and bytes written, and hands them in batches to its sinks,
+e.g. a JSON Lines file that can be read back with readJsonLines or any JSON tool. Progress callbacks can be wrapped in
+a RateLimitedProgress, so that a long sequence reports how far it got every few seconds instead of printing every frame.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import json
+import time
+
+defaultBufferSize = 64     # Records held before they're handed to the sinks
+defaultInterval = 1.0      # Seconds between two progress reports
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Stage timing
+# Seconds spent in each stage of a conversion. lap(stage) closes the stage that ran since the previous lap; resume()
+# starts the next stage after time that doesn't count (e.g. waiting in a queue).
+class StageTimer(object):
+    def __init__(self):
+        self.seconds = {}
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def resume(self):
+        self.last = time.perf_counter()
+
+    def total(self):
+        return sum(self.seconds.values())
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Sinks
+# Appends records as JSON Lines to a file, given as a path or as an open file object. A path is only opened while a batch
+# of records is written, so nothing is left open between batches.
+class JsonLinesSink(object):
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, records):
+        lines = ''.join(json.dumps(record, sort_keys=True) + '\n' for record in records)
+        if hasattr(self.target, 'write'):
+            self.target.write(lines)
+            self.target.flush()
+        else:
+            with open(self.target, 'a') as outFile:
+                outFile.write(lines)
+
+# Keeps records in memory (records attribute)
+class MemorySink(object):
+    def __init__(self):
+        self.records = []
+
+    def write(self, records):
+        self.records.extend(records)
+
+# Records of a JSON Lines file
+def readJsonLines(path):
+    with open(path, 'r') as inFile:
+        return [json.loads(line) for line in inFile if line.strip()]
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Recorder
+# Buffers records and writes them to its sinks (objects with a write(records) method) bufferSize records at a time, on
+# flush() and on close(). Every record gets the name of its event and the time it was recorded.
+class Recorder(object):
+    def __init__(self, sinks=(), bufferSize=defaultBufferSize):
+        self.sinks = list(sinks)
+        self.bufferSize = bufferSize
+        self.buffer = []
+
+    def record(self, event, **fields):
+        fields['event'] = event
+        fields['time'] = time.time()
+        self.buffer.append(fields)
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        records, self.buffer = self.buffer, []
+        if records:
+            for sink in self.sinks:
+                sink.write(records)
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Record of a frame, from its summary (see engine.convertFrame)
+def frameRecord(index, frameInfo):
+    fields = {'index': index,
+              'sourcefile': frameInfo['sourcefile'],
+              'outputPath': frameInfo['outputPath']}
+    for key in ('points', 'removed', 'duplicates', 'decimated', 'bytes', 'seconds', 'stages', 'lods', 'lag', 'skipped', 'error'):
+        if key in frameInfo:
+            fields[key] = frameInfo[key]
+    return fields
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Progress
+# Wraps a progress callback so that it's called with the status of the whole sequence (frames done out of total, points,
+# dropped points, duplicates, bytes, skipped and failed frames, elapsed seconds and the summary of the last frame) at most once every
+# interval seconds. Frames that fail and the last frame are always reported.
+class RateLimitedProgress(object):
+    def __init__(self, callback, total=None, interval=defaultInterval, clock=time.monotonic):
+        self.callback = callback
+        self.interval = interval
+        self.clock = clock
+        self.start = clock()
+        self.lastReport = None
+        self.status = {'done': 0, 'total': total, 'points': 0, 'removed': 0, 'duplicates': 0, 'bytes': 0, 'skipped': 0, 'errors': 0,
+                       'elapsed': 0.0, 'frameInfo': None}
+
+    def __call__(self, frameInfo):
+        status = self.status
+        status['done'] += 1
+        status['frameInfo'] = frameInfo
+        if 'error' in frameInfo:
+            status['errors'] += 1
+        else:
+            status['skipped'] += 1 if frameInfo.get('skipped') else 0
+            for key in ('points', 'removed', 'duplicates', 'bytes'):
+                status[key] += frameInfo.get(key, 0)
+        now = self.clock()
+        if 'error' in frameInfo or status['done'] == status['total'] or self.lastReport is None or now - self.lastReport >= self.interval:
+            self.report(now)
+
+    def report(self, now=None):
+        now = self.clock() if now is None else now
+        self.status['elapsed'] = now - self.start
+        self.lastReport = now
+        self.callback(dict(self.status))
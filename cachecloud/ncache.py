@@ -0,0 +1,418 @@
+"""
+Maya nCache files.
+
+An nCache is an XML description ("<cacheName>.xml": cache type, time range and channels) and channel data in IFF
+files: either one file per frame ("<cacheName>Frame<frame>.mcx") or a single file holding every frame
+("<cacheName>.mcx"). The channels of a particle cache are the particle ids, the particle count, the positions and,
+optionally, the velocities and an extra per-particle attribute, taken from the same arrays as a PDC file.
+
+Channel data files are made of chunks: a 4-character tag, the size of the data and the data, padded to the alignment.
+Chunks are grouped in FOR4 (.mcc, 32-bit sizes, 4-byte alignment) or FOR8 (.mcx, 64-bit sizes, 8-byte alignment)
+groups: a CACH group with the version (VRSN) and time range (STIM, ETIM) of the file, then a MYCH group per frame with
+its time (TIME, in single files only) and, for each channel, its name (CHNM), element count (SIZE) and values. In .mcx
+files tags are padded to 8 bytes like everything else. Times are in ticks (6000 per second), as in PDC files.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import mmap
+import os
+import re
+from struct import Struct
+from xml.etree import ElementTree
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+from . import pdc, transform
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Cache layout
+cacheFormats = ('mcx', 'mcc')
+cacheTypes = ('OneFilePerFrame', 'OneFile')
+cacheVersion = b'0.1'
+descriptionVersion = '2.0'
+# Group tag, struct of the chunk sizes and alignment of each cache format
+iffLayouts = {'mcc': (b'FOR4', Struct('>I'), 4),
+              'mcx': (b'FOR8', Struct('>Q'), 8)}
+intStruct = Struct('>i')
+# Chunk tag, big-endian value type and values per element of each channel type
+channelTypes = {'DoubleArray': (b'DBLA', '>f8', 1),
+                'FloatArray': (b'FBCA', '>f4', 1),
+                'DoubleVectorArray': (b'DVCA', '>f8', 3),
+                'FloatVectorArray': (b'FVCA', '>f4', 3)}
+channelTags = dict((tag, channelType) for channelType, (tag, valueType, width) in channelTypes.items())
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Checks an nCache format and type
+def checkCache(cacheFormat, cacheType):
+    if cacheFormat not in cacheFormats:
+        raise ValueError('Unknown nCache format: {0}. Use one of: {1}.'.format(cacheFormat, ', '.join(cacheFormats)))
+    if cacheType not in cacheTypes:
+        raise ValueError('Unknown nCache type: {0}. Use one of: {1}.'.format(cacheType, ', '.join(cacheTypes)))
+    return cacheFormat, cacheType
+
+# Channel data file of a frame, named after the cache and the frame it holds
+def frameFileName(cacheName, frame, cacheFormat='mcx'):
+    return '{0}Frame{1}.{2}'.format(cacheName, frame, cacheFormat)
+
+# Channel data file of a cache that holds every frame
+def cacheFileName(cacheName, cacheFormat='mcx'):
+    return '{0}.{1}'.format(cacheName, cacheFormat)
+
+def descriptionFileName(cacheName):
+    return cacheName + '.xml'
+
+# Channels of a particle cache, as (channel name, channel type, interpretation). The extra attribute channel (if any)
+# goes last.
+def cacheChannels(cacheName, extraAttr=None, velocity=False):
+    channels = [(cacheName + '_id', 'DoubleArray', 'id'),
+                (cacheName + '_count', 'DoubleArray', 'count'),
+                (cacheName + '_position', 'FloatVectorArray', 'position')]
+    if velocity:
+        channels.append((cacheName + '_velocity', 'FloatVectorArray', 'velocity'))
+    if extraAttr is not None:
+        channels.append((cacheName + '_' + str(extraAttr), 'DoubleArray', str(extraAttr)))
+    return channels
+
+# Channels of a frame, as (channel name, channel type, values, multiplication factor), from the arguments of
+# pdc.writePdc
+def frameChannels(cacheName, pointCoords, particleIds, extraAttr=None, extraAttrValues=None, scaleFactor=1, velocities=None):
+    values = [(particleIds, 1), (np.array([len(pointCoords)], dtype=np.float64), 1), (pointCoords, scaleFactor)]
+    if velocities is not None:
+        values.append((velocities, transform.vectorTransform(scaleFactor)))
+    if extraAttr is not None:
+        values.append((extraAttrValues, 1))
+    return [(name, channelType, channelValues, factor) for (name, channelType, interpretation), (channelValues, factor)
+            in zip(cacheChannels(cacheName, extraAttr, velocities is not None), values)]
+
+# Size of a chunk's data once padded to the alignment
+def paddedSize(size, alignment):
+    return size + (-size % alignment)
+
+def chunkHeaderSize(cacheFormat):
+    groupTag, sizeStruct, alignment = iffLayouts[cacheFormat]
+    return alignment + sizeStruct.size
+
+def chunkHeader(tag, size, cacheFormat):
+    groupTag, sizeStruct, alignment = iffLayouts[cacheFormat]
+    if size > (1 << 8 * sizeStruct.size) - 1:
+        raise ValueError('A frame of {0} bytes is too large for an .{1} file.'.format(size, cacheFormat))
+    return tag.ljust(alignment, b'\0') + sizeStruct.pack(size)
+
+# A whole chunk, with its data padded
+def packChunk(tag, data, cacheFormat):
+    return chunkHeader(tag, len(data), cacheFormat) + data.ljust(paddedSize(len(data), iffLayouts[cacheFormat][2]), b'\0')
+
+# Beginning of a group (of contentSize bytes of chunks): group tag, size and group type
+def groupHeader(groupType, contentSize, cacheFormat):
+    groupTag, sizeStruct, alignment = iffLayouts[cacheFormat]
+    return chunkHeader(groupTag, alignment + contentSize, cacheFormat) + groupType.ljust(alignment, b'\0')
+
+# CACH group at the beginning of every channel data file
+def packCacheHeader(startTick, endTick, cacheFormat):
+    content = (packChunk(b'VRSN', cacheVersion + b'\0', cacheFormat) + packChunk(b'STIM', intStruct.pack(startTick), cacheFormat)
+               + packChunk(b'ETIM', intStruct.pack(endTick), cacheFormat))
+    return groupHeader(b'CACH', len(content), cacheFormat) + content
+
+# Offset of the end time in a channel data file, so that it can be updated once the last frame is written
+def endTickOffset(cacheFormat):
+    alignment = iffLayouts[cacheFormat][2]
+    headerSize = chunkHeaderSize(cacheFormat)
+    return headerSize + alignment + 2 * headerSize + paddedSize(len(cacheVersion) + 1, alignment) + paddedSize(intStruct.size, alignment) + headerSize
+
+# Writes the MYCH group of a frame (with its time, when tick is given) from its channels (see frameChannels). Channel
+# values are written straight from their arrays, a block at a time. Returns the number of bytes written.
+def writeFrameGroup(outFile, channels, cacheFormat, tick=None):
+    alignment = iffLayouts[cacheFormat][2]
+    headerSize = chunkHeaderSize(cacheFormat)
+    chunks = []
+    if tick is not None:
+        chunks.append(packChunk(b'TIME', intStruct.pack(tick), cacheFormat))
+    contentSize = sum(len(chunk) for chunk in chunks)
+    for name, channelType, values, factor in channels:
+        tag, valueType, width = channelTypes[channelType]
+        dataSize = len(values.reshape(-1)) * np.dtype(valueType).itemsize
+        chunks.append((packChunk(b'CHNM', name.encode('ascii') + b'\0', cacheFormat) + packChunk(b'SIZE', intStruct.pack(len(values)), cacheFormat)
+                       + chunkHeader(tag, dataSize, cacheFormat), values, factor, valueType, dataSize))
+        contentSize += len(chunks[-1][0]) + paddedSize(dataSize, alignment)
+    outFile.write(groupHeader(b'MYCH', contentSize, cacheFormat))
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            outFile.write(chunk)
+            continue
+        header, values, factor, valueType, dataSize = chunk
+        outFile.write(header)
+        for block in pdc.recordBlocks(values, factor, valueType=valueType):
+            outFile.write(block)
+        outFile.write(b'\0' * (paddedSize(dataSize, alignment) - dataSize))
+    return headerSize + alignment + contentSize
+
+# Writes the channel data file of a single frame. Returns the size of the file.
+def writeFrameFile(outputPath, tick, channels, cacheFormat='mcx'):
+    with open(outputPath, 'wb') as outFile:
+        outFile.write(packCacheHeader(tick, tick, cacheFormat))
+        writeFrameGroup(outFile, channels, cacheFormat)
+        return outFile.tell()
+
+# XML description of a cache
+def packDescription(channels, cacheType, cacheFormat, startTick, endTick, tickStep):
+    lines = ['<?xml version="1.0"?>',
+             '<Autodesk_Cache_File>',
+             '  <cacheType Type="{0}" Format="{1}"/>'.format(cacheType, cacheFormat),
+             '  <time Range="{0}-{1}"/>'.format(startTick, endTick),
+             '  <cacheTimePerFrame TimePerFrame="{0}"/>'.format(tickStep),
+             '  <cacheVersion Version="{0}"/>'.format(descriptionVersion),
+             '  <extra>Cache Cloud</extra>',
+             '  <Channels>']
+    for index, (name, channelType, interpretation) in enumerate(channels):
+        lines.append('    <channel{0} ChannelName={1} ChannelType="{2}" ChannelInterpretation={3} SamplingType="Regular" '
+                     'SamplingRate="{4}" StartTime="{5}" EndTime="{6}"/>'.format(index, quoteattr(name), channelType,
+                     quoteattr(interpretation), tickStep, startTick, endTick))
+    lines += ['  </Channels>', '</Autodesk_Cache_File>', '']
+    return '\n'.join(lines)
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Writing caches
+# Writes the frames of a particle cache to cacheDir, in one file per frame or in a single file (cacheType), and its XML
+# description on close(). Frames of a single file must be written in order. frames holds the frames of the cache,
+# which go in the time range of the description: the ones written, and any others added to it (e.g. frames written
+# by other processes, or left from an earlier run).
+class CacheWriter(object):
+    def __init__(self, cacheDir, cacheName, frameRate='ntsc', cacheType='OneFilePerFrame', cacheFormat='mcx', extraAttr=None, velocity=False):
+        self.cacheDir = cacheDir
+        self.cacheName = cacheName
+        self.frameRate = frameRate
+        self.cacheFormat, self.cacheType = checkCache(cacheFormat, cacheType)
+        self.channels = cacheChannels(cacheName, extraAttr, velocity)
+        self.frames = set()
+        self.outFile = None
+        self.lastFrame = None
+
+    # Channel data file of a frame (the same for every frame, in a single file cache)
+    def path(self, frame=None):
+        if self.cacheType == 'OneFile':
+            return os.path.join(self.cacheDir, cacheFileName(self.cacheName, self.cacheFormat))
+        return os.path.join(self.cacheDir, frameFileName(self.cacheName, frame, self.cacheFormat))
+
+    def descriptionPath(self):
+        return os.path.join(self.cacheDir, descriptionFileName(self.cacheName))
+
+    # Writes a frame, from the arguments of pdc.writePdc. Returns the number of bytes written.
+    def write(self, frame, pointCoords, particleIds, extraAttr=None, extraAttrValues=None, scaleFactor=1, velocities=None):
+        channels = frameChannels(self.cacheName, pointCoords, particleIds, extraAttr, extraAttrValues, scaleFactor, velocities)
+        if [channel[:2] for channel in channels] != [channel[:2] for channel in self.channels]:
+            raise ValueError('The channels of frame {0} ({1}) are not the ones of the cache.'.format(frame, ', '.join(channel[0] for channel in channels)))
+        tick = pdc.frameTick(frame, self.frameRate)
+        if self.cacheType == 'OneFilePerFrame':
+            bytesWritten = writeFrameFile(self.path(frame), tick, channels, self.cacheFormat)
+        else:
+            if self.lastFrame is not None and frame <= self.lastFrame:
+                raise ValueError('Frame {0} comes after frame {1} in "{2}".'.format(frame, self.lastFrame, self.path()))
+            bytesWritten = 0
+            if self.outFile is None:
+                self.outFile = open(self.path(), 'wb')
+                bytesWritten = self.outFile.write(packCacheHeader(tick, tick, self.cacheFormat))
+            bytesWritten += writeFrameGroup(self.outFile, channels, self.cacheFormat, tick)
+            self.lastFrame = frame
+        self.frames.add(frame)
+        return bytesWritten
+
+    # Finishes the single file (if any) and writes the description of the frames of the cache
+    def close(self):
+        if self.outFile is not None:
+            self.outFile.seek(endTickOffset(self.cacheFormat))
+            self.outFile.write(intStruct.pack(pdc.frameTick(self.lastFrame, self.frameRate)))
+            self.outFile.close()
+            self.outFile = None
+        if self.frames:
+            with open(self.descriptionPath(), 'w') as outFile:
+                outFile.write(packDescription(self.channels, self.cacheType, self.cacheFormat,
+                                              pdc.frameTick(min(self.frames), self.frameRate),
+                                              pdc.frameTick(max(self.frames), self.frameRate), pdc.pdcfileStep(self.frameRate)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Only the settings of a writer go to other processes, never its open file
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['outFile'] = None
+        return state
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Reading caches
+# Time range, time per frame and channels of a cache, from its XML description
+def readDescription(path):
+    try:
+        root = ElementTree.parse(path).getroot()
+        description = {'cacheType': root.find('cacheType').get('Type'),
+                       'cacheFormat': root.find('cacheType').get('Format'),
+                       'timePerFrame': int(root.find('cacheTimePerFrame').get('TimePerFrame')),
+                       'channels': [(channel.get('ChannelName'), channel.get('ChannelType'), channel.get('ChannelInterpretation'))
+                                    for channel in root.find('Channels')]}
+        description['startTick'], description['endTick'] = [int(t) for t in root.find('time').get('Range').rsplit('-', 1)]
+    except (ElementTree.ParseError, AttributeError, TypeError, ValueError):
+        raise ValueError('"{0}" is not a Maya cache description.'.format(path))
+    return description
+
+# A channel data file, memory-mapped. frames lists the frames it holds as (tick, channels), where channels gives where
+# the values of each channel are. Values are numpy views of the mapped file, so nothing gets unpacked or copied until
+# it is used.
+class ChannelFile(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as inFile:
+            if os.fstat(inFile.fileno()).st_size < 16:
+                raise ValueError('"{0}" is not a Maya cache file.'.format(path))
+            self.data = mmap.mmap(inFile.fileno(), 0, access=mmap.ACCESS_READ)
+        layouts = [cacheFormat for cacheFormat, layout in iffLayouts.items() if self.data[:4] == layout[0]]
+        if not layouts:
+            raise ValueError('"{0}" is not a Maya cache file.'.format(path))
+        self.cacheFormat = layouts[0]
+        self.frames = []
+        offset = 0
+        while offset < len(self.data):
+            groupType, start, end = self.group(offset)
+            if offset == 0:
+                if groupType != b'CACH':
+                    raise ValueError('"{0}" doesn\'t begin with a cache header.'.format(path))
+                header = dict((tag, self.data[dataStart:dataStart + size]) for tag, dataStart, size in self.chunks(start, end))
+                self.version = header[b'VRSN'].rstrip(b'\0').decode('ascii')
+                self.startTick, self.endTick = intStruct.unpack(header[b'STIM'])[0], intStruct.unpack(header[b'ETIM'])[0]
+            elif groupType == b'MYCH':
+                self.frames.append(self.indexFrame(start, end))
+            offset = end
+
+    # Group type, and where the chunks of the group at offset begin and end
+    def group(self, offset):
+        groupTag, sizeStruct, alignment = iffLayouts[self.cacheFormat]
+        tag, dataStart, size = self.chunk(offset)
+        if tag != groupTag:
+            raise ValueError('"{0}" has a damaged group at byte {1}.'.format(self.path, offset))
+        return bytes(self.data[dataStart:dataStart + 4]), dataStart + alignment, dataStart + size
+
+    # Tag, data offset and data size of the chunk at offset
+    def chunk(self, offset):
+        groupTag, sizeStruct, alignment = iffLayouts[self.cacheFormat]
+        try:
+            size = sizeStruct.unpack_from(self.data, offset + alignment)[0]
+        except Exception:
+            raise ValueError('"{0}" has a damaged chunk at byte {1}.'.format(self.path, offset))
+        dataStart = offset + alignment + sizeStruct.size
+        if dataStart + size > len(self.data):
+            raise ValueError('"{0}" is too short for its chunk at byte {1}.'.format(self.path, offset))
+        return bytes(self.data[offset:offset + 4]), dataStart, size
+
+    # Chunks from start to end, as (tag, data offset, data size)
+    def chunks(self, start, end):
+        alignment = iffLayouts[self.cacheFormat][2]
+        while start < end:
+            tag, dataStart, size = self.chunk(start)
+            yield tag, dataStart, size
+            start = dataStart + paddedSize(size, alignment)
+
+    # Tick and channels of the MYCH group from start to end. Files with one frame have its time in their header.
+    def indexFrame(self, start, end):
+        tick = self.startTick
+        channels = {}
+        name = None
+        for tag, dataStart, size in self.chunks(start, end):
+            if tag == b'TIME':
+                tick = intStruct.unpack_from(self.data, dataStart)[0]
+            elif tag == b'CHNM':
+                name = self.data[dataStart:dataStart + size].rstrip(b'\0').decode('ascii')
+            elif tag in channelTags and name is not None:
+                channelType = channelTags[tag]
+                tag, valueType, width = channelTypes[channelType]
+                channels[name] = (channelType, dataStart, size // np.dtype(valueType).itemsize)
+        return tick, channels
+
+    # Ticks of the frames in the file, in order
+    def ticks(self):
+        return [tick for tick, channels in self.frames]
+
+    # Values of the channels of a frame (the first one by default), by channel name: (N,3) for vectors, (N,) otherwise
+    def channels(self, tick=None):
+        for frameTick, channels in self.frames:
+            if tick is None or frameTick == tick:
+                return dict((name, self.values(*channel)) for name, channel in channels.items())
+        raise KeyError('"{0}" has no frame at tick {1}.'.format(self.path, tick))
+
+    def values(self, channelType, offset, count):
+        tag, valueType, width = channelTypes[channelType]
+        values = np.frombuffer(self.data, dtype=valueType, count=count, offset=offset)
+        if width > 1:
+            values = values.reshape(-1, width)
+        return values
+
+    # Unmaps the file. Views handed out before keep the mapping alive until they're gone.
+    def close(self):
+        try:
+            self.data.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Multiplies the values of a channel by factor in every frame of a channel data file, in place (see pdc.scaleValues)
+def scaleChannel(path, channelName, factor):
+    with ChannelFile(path) as channelFile:
+        locations = [channels[channelName] for tick, channels in channelFile.frames if channelName in channels]
+    for channelType in set(location[0] for location in locations):
+        pdc.scaleValues(path, [(offset, count) for locationType, offset, count in locations if locationType == channelType],
+                        channelTypes[channelType][1], factor)
+
+# A cache written by a CacheWriter (or by Maya), from its XML description, by frame number. Frames are only read when
+# asked for.
+class CacheSequence(object):
+    def __init__(self, descriptionPath):
+        self.descriptionPath = descriptionPath
+        self.cacheDir, fileName = os.path.split(descriptionPath)
+        self.cacheName = os.path.splitext(fileName)[0]
+        self.description = readDescription(descriptionPath)
+        self.timePerFrame = self.description['timePerFrame']
+        self.cacheFile = None
+
+    # Channel data file of a frame
+    def path(self, frame=None):
+        if self.description['cacheType'] == 'OneFile':
+            return os.path.join(self.cacheDir, cacheFileName(self.cacheName, self.description['cacheFormat']))
+        return os.path.join(self.cacheDir, frameFileName(self.cacheName, frame, self.description['cacheFormat']))
+
+    # Frame numbers of the frames of the cache, in order
+    def frames(self):
+        if self.description['cacheType'] == 'OneFile':
+            return [tick // self.timePerFrame for tick in self.singleFile().ticks()]
+        pattern = re.compile(re.escape(self.cacheName) + r'Frame(-?\d+)\.' + re.escape(self.description['cacheFormat']) + '$')
+        return sorted(int(m.group(1)) for m in (pattern.match(f) for f in os.listdir(self.cacheDir)) if m)
+
+    def singleFile(self):
+        if self.cacheFile is None:
+            self.cacheFile = ChannelFile(self.path())
+        return self.cacheFile
+
+    # Values of the channels of a frame, by channel name
+    def __getitem__(self, frame):
+        if self.description['cacheType'] == 'OneFile':
+            return self.singleFile().channels(frame * self.timePerFrame)
+        with ChannelFile(self.path(frame)) as channelFile:
+            return channelFile.channels()
+
+    def __iter__(self):
+        return iter(self.frames())
+
+    def __len__(self):
+        return len(self.frames())
+
+    def close(self):
+        if self.cacheFile is not None:
+            self.cacheFile.close()
+            self.cacheFile = None
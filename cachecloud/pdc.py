@@ -0,0 +1,254 @@
+"""
+Maya Particle Disk Cache (PDC) files.
+
+Packs point coordinates, particle ids, optional velocities and an optional extra per-particle attribute into the binary
+PDC format, and names the files with the tick increments Maya expects for each frame rate.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import mmap
+import os
+import re
+from struct import Struct
+
+import numpy as np
+
+from . import transform
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Default header values for writing binary PDC files
+fileType = b'PDC '
+formatVersion = 1
+byteOrder = 1
+extra1 = 0
+extra2 = 0
+headerForm = '>4sii2iii'
+headerStruct = Struct(headerForm)
+intStruct = Struct('>i')
+blockSize = 1 << 20 # Values converted to big-endian at a time when writing a record
+dataType = {'Integer': 0,
+            'Integer Array': 1,
+            'Double': 2,
+            'Double Array': 3,
+            'Vector': 4,
+            'Vector Array': 5}
+# Value type, and number of values per element, of each data type
+dataLayout = {dataType['Integer']: ('i4', 1),
+              dataType['Integer Array']: ('i4', 1),
+              dataType['Double']: ('f8', 1),
+              dataType['Double Array']: ('f8', 1),
+              dataType['Vector']: ('f8', 3),
+              dataType['Vector Array']: ('f8', 3)}
+arrayTypes = (dataType['Integer Array'], dataType['Double Array'], dataType['Vector Array'])
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Function for setting the PDC file incremental value according to frame rate
+def pdcfileStep(frameRate):
+    if frameRate == 'pal':
+        return 240
+    elif frameRate == 'ntsc':
+        return 200
+    elif frameRate == 'film':
+        return 250
+    elif frameRate == 'palf':
+        return 120
+    elif frameRate == 'ntscf':
+        return 100
+    elif frameRate == 'show':
+        return 125
+    else:
+        return 200
+
+# Frames per second of a frame rate (a second is 6000 ticks)
+def framesPerSecond(frameRate):
+    return 6000.0 / pdcfileStep(frameRate)
+
+# Tick of the PDC file of a frame
+def frameTick(frame, frameRate):
+    return frame * pdcfileStep(frameRate)
+
+# PDC files are named after the particle shape and the tick of the frame they hold
+def pdcFileName(pdcBasename, tick):
+    return pdcBasename + '.' + str(tick) + '.pdc'
+
+# Attribute records of a single PDC file, as (name, data type, values, multiplication factor). The extra attribute
+# record (if any) goes first, and the velocity record (if any) after the positions. scaleFactor is a multiplication
+# factor, or an affine transform of the points (see transform.pointTransform); velocities only get its linear part.
+def pdcRecords(pointCoords, particleIds, extraAttr=None, extraAttrValues=None, scaleFactor=1, velocities=None):
+    records = [('position', dataType['Vector Array'], pointCoords, scaleFactor),
+               ('particleId', dataType['Double Array'], particleIds, 1)]
+    if velocities is not None:
+        records.insert(1, ('velocity', dataType['Vector Array'], velocities, transform.vectorTransform(scaleFactor)))
+    if extraAttr is not None:
+        records = [(str(extraAttr), dataType['Double Array'], extraAttrValues, 1)] + records
+    return records
+
+# Header of a PDC file
+def packHeader(particlesTotal, attributesTotal):
+    return headerStruct.pack(fileType, formatVersion, byteOrder, extra1, extra2, particlesTotal, attributesTotal)
+
+# Beginning of an attribute record: name length, name and data type
+def packRecordHeader(name, recordType):
+    name = name.encode('ascii')
+    return intStruct.pack(len(name)) + name + intStruct.pack(recordType)
+
+# Values of an attribute record, as buffers of big-endian doubles (or valueType) of up to blockSize values each.
+# Converting a block at a time keeps the big-endian copy small, whatever the size of the frame. factor is a
+# multiplication factor, or an affine transform of vectors (see transform.py), applied to each block as it's converted.
+def recordBlocks(values, factor=1, blockSize=blockSize, valueType='>f8'):
+    if isinstance(factor, np.ndarray):
+        for start, block in transform.transformBlocks(values.reshape(-1, 3), factor, max(blockSize // 3, 1)):
+            yield np.ascontiguousarray(block, dtype=valueType).reshape(-1)
+        return
+    values = values.reshape(-1)
+    for start in range(0, len(values), blockSize):
+        block = values[start:start + blockSize]
+        if factor != 1:
+            block = block * factor
+        yield np.ascontiguousarray(block, dtype=valueType)
+
+# Packs the header and records of a single PDC file
+def packPdc(pointCoords, particleIds, extraAttr=None, extraAttrValues=None, scaleFactor=1, velocities=None):
+    records = pdcRecords(pointCoords, particleIds, extraAttr, extraAttrValues, scaleFactor, velocities)
+    packedData = [packHeader(len(pointCoords), len(records))]
+    for name, recordType, values, factor in records:
+        packedData.append(packRecordHeader(name, recordType))
+        packedData += [block.tobytes() for block in recordBlocks(values, factor)]
+    return b''.join(packedData)
+
+# Writes a single PDC file. Records are written straight from their arrays, without packing the whole file first.
+def writePdc(outputPath, pointCoords, particleIds, extraAttr=None, extraAttrValues=None, scaleFactor=1, velocities=None):
+    records = pdcRecords(pointCoords, particleIds, extraAttr, extraAttrValues, scaleFactor, velocities)
+    with open(outputPath, 'wb') as outputPDCfile:
+        outputPDCfile.write(packHeader(len(pointCoords), len(records)))
+        for name, recordType, values, factor in records:
+            outputPDCfile.write(packRecordHeader(name, recordType))
+            for block in recordBlocks(values, factor):
+                outputPDCfile.write(block)
+        return outputPDCfile.tell()
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Reading PDC files
+# A PDC file, memory-mapped. Each attribute record is a numpy view of the mapped file (e.g. pdcFile['position'] is a
+# (N,3) array), so nothing gets unpacked or copied until it is used.
+class PdcFile(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as inFile:
+            if os.fstat(inFile.fileno()).st_size < headerStruct.size:
+                raise ValueError('"{0}" is not a PDC file.'.format(path))
+            self.data = mmap.mmap(inFile.fileno(), 0, access=mmap.ACCESS_READ)
+        header = headerStruct.unpack_from(self.data, 0)
+        if header[0] != fileType:
+            raise ValueError('"{0}" is not a PDC file.'.format(path))
+        self.formatVersion, self.byteOrder, self.extra1, self.extra2, self.particlesTotal, self.attributesTotal = header[1:]
+        self.endian = '>' if self.byteOrder == 1 else '<'
+        self.intStruct = Struct(self.endian + 'i')
+        self.records = {}
+        self.attributes = []
+        offset = headerStruct.size
+        for i in range(self.attributesTotal):
+            offset = self.indexRecord(offset)
+
+    # Finds where the values of the record at offset are, and returns the offset of the next record
+    def indexRecord(self, offset):
+        try:
+            nameLength = self.intStruct.unpack_from(self.data, offset)[0]
+            name = self.data[offset + 4:offset + 4 + nameLength].decode('ascii')
+            recordType = self.intStruct.unpack_from(self.data, offset + 4 + nameLength)[0]
+        except Exception:
+            raise ValueError('"{0}" has a damaged record at byte {1}.'.format(self.path, offset))
+        if recordType not in dataLayout:
+            raise ValueError('"{0}" has an unknown data type ({1}) for "{2}".'.format(self.path, recordType, name))
+        valueType, width = dataLayout[recordType]
+        count = width * (self.particlesTotal if recordType in arrayTypes else 1)
+        offset += 8 + nameLength
+        end = offset + count * np.dtype(valueType).itemsize
+        if end > len(self.data):
+            raise ValueError('"{0}" is too short for its "{1}" record.'.format(self.path, name))
+        self.records[name] = (recordType, offset, count)
+        self.attributes.append(name)
+        return end
+
+    # Data type of an attribute record
+    def recordType(self, name):
+        return self.records[name][0]
+
+    # Values of an attribute record, as a read-only view of the file: (N,3) for vectors, (N,) otherwise
+    def __getitem__(self, name):
+        recordType, offset, count = self.records[name]
+        valueType, width = dataLayout[recordType]
+        values = np.frombuffer(self.data, dtype=self.endian + valueType, count=count, offset=offset)
+        if width > 1:
+            values = values.reshape(-1, width)
+        return values
+
+    def __contains__(self, name):
+        return name in self.records
+
+    # Unmaps the file. Views handed out before keep the mapping alive until they're gone.
+    def close(self):
+        try:
+            self.data.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Multiplies the values of an attribute record of a PDC file by factor, in place. The file is then the same as if the
+# values had been multiplied before it was written.
+def scaleRecord(path, name, factor):
+    with PdcFile(path) as pdcFile:
+        recordType, offset, count = pdcFile.records[name]
+        valueType = pdcFile.endian + dataLayout[recordType][0]
+    scaleValues(path, [(offset, count)], valueType, factor)
+
+# Multiplies the values of a file at each (offset, count) location by factor, in place, as valueType values. Values are
+# read and written back a block of at most blockSize values at a time.
+def scaleValues(path, locations, valueType, factor, blockSize=blockSize):
+    itemSize = np.dtype(valueType).itemsize
+    with open(path, 'r+b') as outFile:
+        for offset, count in locations:
+            for start in range(0, count, blockSize):
+                outFile.seek(offset + start * itemSize)
+                block = np.fromfile(outFile, dtype=valueType, count=min(blockSize, count - start))
+                outFile.seek(offset + start * itemSize)
+                outFile.write((block * factor).astype(valueType).tobytes())
+
+# The PDC files of a particle shape in a cache directory, by frame number. Frames are only opened when asked for.
+class PdcSequence(object):
+    def __init__(self, cacheoutputDir, pdcBasename, frameRate='ntsc'):
+        self.cacheoutputDir = cacheoutputDir
+        self.pdcBasename = pdcBasename
+        self.frameRate = frameRate
+
+    # Path of the PDC file of a frame
+    def path(self, frame):
+        return os.path.join(self.cacheoutputDir, pdcFileName(self.pdcBasename, frameTick(frame, self.frameRate)))
+
+    # Frame numbers of all the PDC files in the cache directory, in order
+    def frames(self):
+        step = pdcfileStep(self.frameRate)
+        pattern = re.compile(re.escape(self.pdcBasename) + r'\.(-?\d+)\.pdc$')
+        ticks = [int(m.group(1)) for m in (pattern.match(f) for f in os.listdir(self.cacheoutputDir)) if m]
+        return sorted(tick // step for tick in ticks if tick % step == 0)
+
+    def open(self, frame):
+        return PdcFile(self.path(frame))
+
+    def __getitem__(self, frame):
+        return self.open(frame)
+
+    def __contains__(self, frame):
+        return os.path.isfile(self.path(frame))
+
+    def __iter__(self):
+        return iter(self.frames())
+
+    def __len__(self):
+        return len(self.frames())
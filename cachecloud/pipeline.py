@@ -0,0 +1,136 @@
+"""
+Threads for pipelined conversions.
+
+A ReadAhead reads the next source files on a thread while the current one is parsed, and a BackgroundWorker writes the
+previous PDC files on another, so that disk (or network) time overlaps with the parsing and packing. Both hand items
+over through bounded queues, so only a few frames are ever in flight, and both keep the order of the items. An error
+on either thread is passed back with its item and raised (or reported) on the main thread.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import queue
+import threading
+import time
+
+defaultDepth = 2    # Items read ahead (and waiting to be written)
+pollInterval = 0.1  # Seconds between checks for a stop while waiting on a full queue
+endOfItems = object()
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Read-ahead
+# Iterates over (item, result, seconds, error) for each item, in order, where result is read(item), computed on a
+# thread up to depth items ahead of the iteration. error is the exception read raised, if any (result is then None).
+class ReadAhead(object):
+    def __init__(self, items, read, depth=defaultDepth):
+        self.read = read
+        self.queue = queue.Queue(maxsize=max(int(depth), 1))
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(list(items),), name='cachecloud-reader')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self, items):
+        for item in items:
+            start = time.perf_counter()
+            try:
+                result, error = self.read(item), None
+            except Exception as e:
+                result, error = None, e
+            if not self.put((item, result, time.perf_counter() - start, error)):
+                return
+        self.put(endOfItems)
+
+    # Waits for room in the queue, unless the iteration was stopped
+    def put(self, entry):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(entry, timeout=pollInterval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        while True:
+            entry = self.queue.get()
+            if entry is endOfItems:
+                return
+            yield entry
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Background work
+# Runs work(*task) for each task submitted, in order, on a thread. submit() waits while depth tasks are already waiting.
+# Finished tasks come out of finished() (whatever is done so far) and drain() (everything, once no more tasks will be
+# submitted) as (task, result, error). close() stops after the task in progress and drops the ones still waiting.
+class BackgroundWorker(object):
+    def __init__(self, work, depth=defaultDepth):
+        self.work = work
+        self.tasks = queue.Queue(maxsize=max(int(depth), 1))
+        self.done = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='cachecloud-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is endOfItems:
+                break
+            if self.stopped.is_set():
+                continue
+            try:
+                result, error = self.work(*task), None
+            except Exception as e:
+                result, error = None, e
+            self.done.put((task, result, error))
+        self.done.put(endOfItems)
+
+    def submit(self, *task):
+        self.tasks.put(task)
+
+    def finished(self):
+        while True:
+            try:
+                entry = self.done.get_nowait()
+            except queue.Empty:
+                return
+            if entry is endOfItems:
+                return
+            yield entry
+
+    def drain(self):
+        self.tasks.put(endOfItems)
+        while True:
+            entry = self.done.get()
+            if entry is endOfItems:
+                return
+            yield entry
+
+    def close(self):
+        if not self.thread.is_alive():
+            return
+        self.stopped.set()
+        while True:
+            try:
+                self.tasks.get_nowait()
+            except queue.Empty:
+                break
+        self.tasks.put(endOfItems)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
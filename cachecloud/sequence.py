@@ -0,0 +1,113 @@
+"""
+Point cloud data sequences.
+
+Source files are named serially, with the frame number in the suffix (for example "frame001.txt", "dynamite01.csv" or
+"scan2_0001.txt"). The frame number is the last run of digits before the extension; everything before it is the
+prefix, which together with the extension identifies the sequence. The extension of a compressed source file includes
+the compression, as in "frame0001.csv.gz".
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import os
+import re
+
+from .formats import compressedExtensions
+
+framePattern = re.compile(r'^(?P<prefix>.*?)(?P<frame>\d+)(?P<ext>(?:\.[^.]*)?(?i:{0})?)$'.format(
+    '|'.join(re.escape(extension) for extension in compressedExtensions)))
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Prefix, frame number and extension of a source file name, or None if it has no frame number
+def splitFrameName(fileName):
+    match = framePattern.match(os.path.basename(fileName))
+    if match is None:
+        return None
+    return match.group('prefix'), int(match.group('frame')), match.group('ext') or ''
+
+def checkFrameName(fileName):
+    parts = splitFrameName(fileName)
+    if parts is None:
+        raise ValueError('"{0}" has no frame number in its name.'.format(fileName))
+    return parts
+
+# Frame number of a source file
+def frameNumber(fileName):
+    return checkFrameName(fileName)[1]
+
+# Name of a source file without its frame number and extension
+def namePrefix(fileName):
+    return checkFrameName(fileName)[0]
+
+# Extension of a source file
+def fileExtension(fileName):
+    return checkFrameName(fileName)[2]
+
+# Sorts source files by sequence, then by frame number. Files without a frame number go last, by name.
+def sortByFrame(sourceFiles):
+    def frameKey(fileName):
+        parts = splitFrameName(fileName)
+        if parts is None:
+            return (1, os.path.basename(fileName), 0, '')
+        return (0, parts[0], parts[1], parts[2])
+    return sorted(sourceFiles, key=frameKey)
+
+# Frame index of a sequence: sorted (frame number, path) pairs of all the files in sourceDir with the given prefix and
+# extension. The directory is listed once with os.scandir, which usually knows which entries are files without a stat
+# call for each of them. If two files have the same frame number (e.g. "frame01.txt" and "frame001.txt"), the first
+# one by name is used.
+def scanSequence(sourceDir, prefix, ext):
+    frames = {}
+    for entry in os.scandir(sourceDir or '.'):
+        match = framePattern.match(entry.name)
+        if match is None or match.group('prefix') != prefix or (match.group('ext') or '') != ext:
+            continue
+        if not entry.is_file():
+            continue
+        frame = int(match.group('frame'))
+        if frame not in frames or entry.name < os.path.basename(frames[frame]):
+            frames[frame] = os.path.join(sourceDir, entry.name)
+    return sorted(frames.items())
+
+# Frames missing from a frame index, between its first and last frame (every step frames)
+def missingFrames(frameIndex, step=1):
+    if not frameIndex:
+        return []
+    present = set(frame for frame, path in frameIndex)
+    first, last = frameIndex[0][0], frameIndex[-1][0]
+    return [frame for frame in range(first, last + 1, step) if frame not in present]
+
+# Selects the frames from start to end (both included, either one open if None), every step frames from start
+def selectFrames(frameIndex, start=None, end=None, step=1):
+    if step < 1:
+        raise ValueError('The frame step must be 1 or more.')
+    if start is None and frameIndex:
+        start = frameIndex[0][0]
+    return [(frame, path) for frame, path in frameIndex
+            if frame >= start and (end is None or frame <= end) and (frame - start) % step == 0]
+
+# Frame index of the sequence of firstFile, from firstFile on (or from start to end, every step frames)
+def sequenceIndex(firstFile, start=None, end=None, step=1):
+    sourceDir = os.path.dirname(firstFile)
+    prefix, firstFrame, ext = checkFrameName(firstFile)
+    return selectFrames(scanSequence(sourceDir, prefix, ext), firstFrame if start is None else start, end, step)
+
+# Frame each source file is converted to. Frames follow the frame numbers of the source files, from firstFrame for the
+# first one (default: its own frame number), so that gaps and steps in the sequence stay gaps and steps in the cache.
+# Source files without frame numbers, or not in increasing frame order, go to consecutive frames from firstFrame.
+def outputFrames(sourceFiles, firstFrame=None):
+    numbers = [splitFrameName(fileName) for fileName in sourceFiles]
+    byNumber = all(parts is not None for parts in numbers)
+    if byNumber:
+        numbers = [parts[1] for parts in numbers]
+        byNumber = all(a < b for a, b in zip(numbers, numbers[1:]))
+    if firstFrame is None:
+        firstFrame = frameNumber(sourceFiles[0]) if sourceFiles else 0
+    if not byNumber:
+        return [firstFrame + index for index in range(len(sourceFiles))]
+    return [firstFrame + number - numbers[0] for number in numbers]
+
+# Makes a list of all the files in the sequence of firstFile, from firstFile on (or from start to end, every step
+# frames), in frame order
+def sequenceFiles(firstFile, start=None, end=None, step=1):
+    return [path for frame, path in sequenceIndex(firstFile, start, end, step)]
@@ -0,0 +1,98 @@
+"""
+Sequence statistics.
+
+Each frame is summed up once, right after it's parsed and filtered: its point count, bounding box, and the count, min,
+max, mean and sum of squared deviations of its extra attribute values. Frame summaries are plain dicts, so they can come
+back from worker processes and go in the manifest, and they're merged into the statistics of the whole sequence
+without ever going over the points again (means and variances are combined with Chan's formulas). The sequence-wide
+maximum gives the extra attribute scale factor of the automatic normalization, consistent for every frame.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+histogramBins = 10 # Bins of the point count histogram
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Count, min, max, mean and sum of squared deviations (m2) of some values
+def valueStats(values):
+    if not len(values):
+        return {'count': 0, 'min': None, 'max': None, 'mean': 0.0, 'm2': 0.0}
+    mean = float(values.mean())
+    deviations = values - mean
+    return {'count': len(values), 'min': float(values.min()), 'max': float(values.max()), 'mean': mean,
+            'm2': float(np.dot(deviations, deviations))}
+
+# Statistics of the values of a and b together
+def mergeValueStats(a, b):
+    if not b['count']:
+        return dict(a)
+    if not a['count']:
+        return dict(b)
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    return {'count': count, 'min': min(a['min'], b['min']), 'max': max(a['max'], b['max']),
+            'mean': a['mean'] + delta * b['count'] / count,
+            'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / count}
+
+# Summary of a frame: its point count, bounding box (None without points) and extra attribute value statistics (None
+# without extra values)
+def frameStats(pointCoords, extraAttrValues=None):
+    summary = {'points': len(pointCoords), 'boxMin': None, 'boxMax': None, 'extra': None}
+    if len(pointCoords):
+        summary['boxMin'] = pointCoords.min(axis=0).tolist()
+        summary['boxMax'] = pointCoords.max(axis=0).tolist()
+    if extraAttrValues is not None:
+        summary['extra'] = valueStats(extraAttrValues)
+    return summary
+
+# Statistics of a whole sequence, from the summaries of its frames (see frameStats), added in any order
+class SequenceStats(object):
+    def __init__(self, frameSummaries=()):
+        self.pointCounts = []
+        self.boxMin = None
+        self.boxMax = None
+        self.extra = None
+        for summary in frameSummaries:
+            self.add(summary)
+
+    def add(self, summary):
+        self.pointCounts.append(summary['points'])
+        if summary['boxMin'] is not None:
+            self.boxMin = summary['boxMin'] if self.boxMin is None else [min(a, b) for a, b in zip(self.boxMin, summary['boxMin'])]
+            self.boxMax = summary['boxMax'] if self.boxMax is None else [max(a, b) for a, b in zip(self.boxMax, summary['boxMax'])]
+        if summary['extra'] is not None:
+            self.extra = summary['extra'] if self.extra is None else mergeValueStats(self.extra, summary['extra'])
+
+    # Variance of the extra attribute values (None without any)
+    def extraVariance(self):
+        if not self.extra or not self.extra['count']:
+            return None
+        return self.extra['m2'] / self.extra['count']
+
+    # Histogram of the point counts of the frames: counts of frames, and the bin edges
+    def pointHistogram(self, bins=histogramBins):
+        if not self.pointCounts:
+            return [], []
+        counts, edges = np.histogram(self.pointCounts, bins=min(bins, len(self.pointCounts)))
+        return counts.tolist(), edges.tolist()
+
+    # Multiplication factor that brings the largest extra attribute value of the sequence to 1 (1 if there's none)
+    def normalizeFactor(self):
+        if not self.extra or not self.extra['count'] or not self.extra['max'] > 0:
+            return 1.0
+        return 1.0 / self.extra['max']
+
+    # Everything as a dict, e.g. for a metrics record
+    def summary(self):
+        counts, edges = self.pointHistogram()
+        summary = {'frames': len(self.pointCounts), 'points': sum(self.pointCounts),
+                   'minPoints': min(self.pointCounts) if self.pointCounts else None,
+                   'maxPoints': max(self.pointCounts) if self.pointCounts else None,
+                   'boxMin': self.boxMin, 'boxMax': self.boxMax,
+                   'pointHistogram': {'counts': counts, 'edges': edges}}
+        if self.extra is not None:
+            summary['extra'] = {'count': self.extra['count'], 'min': self.extra['min'], 'max': self.extra['max'],
+                                'mean': self.extra['mean'], 'variance': self.extraVariance()}
+        return summary
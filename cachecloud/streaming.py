@@ -0,0 +1,103 @@
+"""
+Streaming ingest for frames too large to read in one go.
+
+The source file is read in chunks of chunkSize characters, cut at line boundaries. Each chunk is parsed and filtered on
+its own and its points are appended to preallocated arrays, so the whole text of the frame is never in memory; only
+one chunk of it plus the arrays that end up in the PDC file.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import os
+
+import numpy as np
+
+from . import filters, formats
+
+defaultChunkSize = 1 << 24 # Characters of text read at a time
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Frame buffer
+# Point coordinates, particle ids and extra attribute values of a frame, in arrays that are allocated once and only
+# grow if the first estimate of the number of points falls short
+class FrameBuffer(object):
+    def __init__(self, capacity, hasExtra):
+        capacity = max(int(capacity), 1)
+        self.size = 0
+        self.pointCoords = np.empty((capacity, 3), dtype=np.float64)
+        self.particleIds = np.empty(capacity, dtype=np.int64)
+        self.extraAttrValues = np.empty(capacity, dtype=np.float64) if hasExtra else None
+
+    def capacity(self):
+        return len(self.particleIds)
+
+    def grow(self, needed):
+        capacity = max(needed, self.capacity() + self.capacity()//2)
+        self.pointCoords.resize((capacity, 3), refcheck=False)
+        self.particleIds.resize(capacity, refcheck=False)
+        if self.extraAttrValues is not None:
+            self.extraAttrValues.resize(capacity, refcheck=False)
+
+    def append(self, pointCoords, particleIds, extraAttrValues=None):
+        start, end = self.size, self.size + len(pointCoords)
+        if end > self.capacity():
+            self.grow(end)
+        self.pointCoords[start:end] = pointCoords
+        self.particleIds[start:end] = particleIds
+        if self.extraAttrValues is not None:
+            self.extraAttrValues[start:end] = extraAttrValues
+        self.size = end
+
+    # Views of the filled part of the arrays
+    def arrays(self):
+        extraAttrValues = None if self.extraAttrValues is None else self.extraAttrValues[:self.size]
+        return self.pointCoords[:self.size], self.particleIds[:self.size], extraAttrValues
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Reads the text of a source file in chunks of about chunkSize characters, each ending at the end of a line
+def readChunks(sourcefile, chunkSize=defaultChunkSize):
+    remainder = ''
+    with formats.openSource(sourcefile) as inFile:
+        while True:
+            chunk = formats.readSource(inFile, sourcefile, chunkSize)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            lineEnd = chunk.rfind('\n') + 1
+            if lineEnd == 0: # A line longer than the chunk, keep reading
+                remainder = chunk
+                continue
+            remainder = chunk[lineEnd:]
+            yield chunk[:lineEnd]
+    if remainder:
+        yield remainder
+
+# Reads, parses and filters a source file a chunk at a time. Returns the point coordinates, particle ids and extra
+# attribute values of the points that passed the filters, and the number of points read. With checkLayout, the form of
+# array is checked against the first chunk.
+def readFrameStreaming(sourcefile, arrayDelimiter, arrayFormResult, filterSpecs=(), chunkSize=defaultChunkSize, checkLayout=False):
+    hasExtra = formats.arrayColumns.get(arrayFormResult, (None, None))[1] is not None
+    frameBuffer = None
+    pointsRead = 0
+    for chunk in readChunks(sourcefile, chunkSize):
+        if checkLayout and frameBuffer is None:
+            formats.checkArrayForm(sourcefile, chunk, arrayDelimiter, arrayFormResult)
+        try:
+            pointCoords, extraAttrValues = formats.parseText(chunk, arrayDelimiter, arrayFormResult, skipHeader=frameBuffer is None)
+        except ValueError as e:
+            raise ValueError('"{0}": {1}'.format(sourcefile, e))
+        if frameBuffer is None: # Estimate the number of points in the file from the first chunk (too low for a compressed file, the buffer grows then)
+            bytesPerPoint = float(len(chunk)) / max(len(pointCoords), 1)
+            frameBuffer = FrameBuffer(os.path.getsize(str(sourcefile)) / bytesPerPoint * 1.05 + 1, hasExtra)
+        chunkStart = pointsRead # The particleId of a point is its offset in the whole file
+        pointsRead += len(pointCoords)
+        if filterSpecs:
+            pointCoords, particleIds, extraAttrValues = filters.applyMask(filters.keepMask(pointCoords, filterSpecs), pointCoords, extraAttrValues)
+            particleIds += chunkStart
+        else:
+            particleIds = np.arange(chunkStart, pointsRead)
+        frameBuffer.append(pointCoords, particleIds, extraAttrValues)
+    if frameBuffer is None:
+        frameBuffer = FrameBuffer(0, hasExtra)
+    pointCoords, particleIds, extraAttrValues = frameBuffer.arrays()
+    return pointCoords, particleIds, extraAttrValues, pointsRead
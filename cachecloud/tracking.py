@@ -0,0 +1,147 @@
+"""
+Particle tracking across frames.
+
+Each point of a frame is matched to the nearest point of the previous frame within maxDistance, and takes its particle
+id, so that the same particle keeps the same id from frame to frame (for motion blur, trails or velocity in Maya).
+Points that aren't matched get new ids. A previous point only passes its id on once: if several points have it as
+their nearest one, the closest of them gets it. Nearest points are found through a grid hash with cells of maxDistance,
+so each point is only compared with the points of the 27 cells around it, and cells are looked up in a hash table.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+from . import dedupe
+
+queryBatch = 1 << 16 # Points looked up at a time, which bounds the number of candidate pairs held in memory
+cellOffsets = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64)
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Checks a tracking distance (None for no tracking)
+def checkTracking(maxDistance):
+    if maxDistance is not None and not maxDistance > 0:
+        raise ValueError('The tracking distance must be more than 0, not {0}.'.format(maxDistance))
+    return maxDistance
+
+# Occupied cells of a set of points, in a hash table with open addressing: for each cell key, where its points start
+# in the points sorted by key, and how many there are
+class CellTable(object):
+    def __init__(self, keys):
+        self.order = np.argsort(keys, kind='stable')
+        sortedKeys = keys[self.order]
+        firsts = np.flatnonzero(np.concatenate(([True], sortedKeys[1:] != sortedKeys[:-1])))
+        cellKeys = sortedKeys[firsts]
+        self.tableBits = int(2 * len(cellKeys) - 1).bit_length()
+        tableSize = 1 << self.tableBits
+        self.keys = np.zeros(tableSize, dtype=np.uint64)
+        self.starts = np.full(tableSize, -1, dtype=np.int64)
+        self.counts = np.zeros(tableSize, dtype=np.int64)
+        cellCounts = np.diff(np.append(firsts, len(sortedKeys)))
+        pending = np.arange(len(cellKeys))
+        slots = self.slots(cellKeys)
+        while len(pending): # Keys are all different, so the first one to claim an empty slot gets it
+            empty = self.starts[slots[pending]] == -1
+            claims = np.full(tableSize, len(cellKeys), dtype=np.int64)
+            np.minimum.at(claims, slots[pending[empty]], pending[empty])
+            placed = pending[empty][claims[slots[pending[empty]]] == pending[empty]]
+            self.keys[slots[placed]] = cellKeys[placed]
+            self.starts[slots[placed]] = firsts[placed]
+            self.counts[slots[placed]] = cellCounts[placed]
+            pending = np.setdiff1d(pending, placed, assume_unique=True)
+            slots[pending] = (slots[pending] + 1) & (tableSize - 1)
+
+    def slots(self, keys):
+        return (keys >> np.uint64(64 - self.tableBits)).astype(np.int64)
+
+    # Where the points of each cell start, and how many there are (0 for empty cells)
+    def lookup(self, keys):
+        starts = np.zeros(len(keys), dtype=np.int64)
+        counts = np.zeros(len(keys), dtype=np.int64)
+        pending = np.arange(len(keys))
+        slots = self.slots(keys)
+        while len(pending):
+            pendingSlots = slots[pending]
+            found = (self.keys[pendingSlots] == keys[pending]) & (self.starts[pendingSlots] != -1)
+            starts[pending[found]] = self.starts[pendingSlots[found]]
+            counts[pending[found]] = self.counts[pendingSlots[found]]
+            pending = pending[~found & (self.starts[pendingSlots] != -1)]
+            slots[pending] = (slots[pending] + 1) & (len(self.keys) - 1)
+        return starts, counts
+
+# Index of the nearest reference point of each query point, and the squared distance to it. Query points with no
+# reference point within maxDistance get -1 (and an infinite distance).
+def nearestPoints(queryCoords, referenceCoords, maxDistance):
+    nearest = np.full(len(queryCoords), -1, dtype=np.int64)
+    nearestSquared = np.full(len(queryCoords), np.inf)
+    if not len(queryCoords) or not len(referenceCoords):
+        return nearest, nearestSquared
+    cellSize = float(maxDistance)
+    cellTable = CellTable(dedupe.cellKeys(np.floor(referenceCoords / cellSize).astype(np.int64)))
+    for start in range(0, len(queryCoords), queryBatch):
+        batchCoords = queryCoords[start:start + queryBatch]
+        batchCells = np.floor(batchCoords / cellSize).astype(np.int64)
+        batchNearest = nearest[start:start + queryBatch]
+        batchSquared = nearestSquared[start:start + queryBatch]
+        for offset in cellOffsets:
+            low, counts = cellTable.lookup(dedupe.cellKeys(batchCells + offset))
+            pairsTotal = int(counts.sum())
+            if not pairsTotal:
+                continue
+            # Candidate pairs: every query point with every reference point of the neighbouring cell
+            queries = np.repeat(np.arange(len(batchCoords)), counts)
+            candidates = cellTable.order[np.arange(pairsTotal) + np.repeat(low - (np.cumsum(counts) - counts), counts)]
+            difference = batchCoords[queries] - referenceCoords[candidates]
+            squared = np.einsum('ij,ij->i', difference, difference)
+            np.minimum.at(batchSquared, queries, squared)
+            closest = squared == batchSquared[queries]
+            batchNearest[queries[closest]] = candidates[closest]
+    outside = nearestSquared > float(maxDistance)**2
+    nearest[outside] = -1
+    nearestSquared[outside] = np.inf
+    return nearest, nearestSquared
+
+# Particle ids of a frame from one frame to the next
+class ParticleTracker(object):
+    def __init__(self, maxDistance):
+        self.maxDistance = float(maxDistance)
+        self.pointCoords = None
+        self.particleIds = None
+        self.nextId = 0
+        self.frame = None
+
+    # Gives the points of the next frame the ids of the points they match in the previous one, and new ids to the
+    # others. The points of the first frame keep the ids they have. Returns the particle ids and the displacement of
+    # each point since the previous frame (zero for the points that weren't matched). With frame numbers, frames can be
+    # apart, and the displacement is divided by the number of frames between them, so it's always per frame. Frames
+    # must then come in frame order: a frame that isn't after the previous one raises a ValueError.
+    def track(self, pointCoords, particleIds, frame=None):
+        if frame is not None and self.frame is not None and frame <= self.frame:
+            raise ValueError('Frame {0} comes after frame {1}: particles can only be tracked in frame order.'.format(frame, self.frame))
+        displacement = np.zeros_like(pointCoords)
+        if self.pointCoords is None:
+            trackedIds = np.asarray(particleIds, dtype=np.int64).copy()
+        else:
+            nearest, nearestSquared = nearestPoints(pointCoords, self.pointCoords, self.maxDistance)
+            matched = np.flatnonzero(nearest >= 0)
+            # One point per previous point: the closest one, or the first of the closest ones
+            closestSquared = np.full(len(self.pointCoords), np.inf)
+            np.minimum.at(closestSquared, nearest[matched], nearestSquared[matched])
+            matched = matched[nearestSquared[matched] == closestSquared[nearest[matched]]]
+            owners = np.full(len(self.pointCoords), len(pointCoords), dtype=np.int64)
+            np.minimum.at(owners, nearest[matched], matched)
+            matched = matched[owners[nearest[matched]] == matched]
+            trackedIds = np.empty(len(pointCoords), dtype=np.int64)
+            unmatched = np.ones(len(pointCoords), dtype=bool)
+            unmatched[matched] = False
+            trackedIds[matched] = self.particleIds[nearest[matched]]
+            trackedIds[unmatched] = self.nextId + np.arange(np.count_nonzero(unmatched))
+            displacement[matched] = pointCoords[matched] - self.pointCoords[nearest[matched]]
+            if frame is not None and self.frame is not None and frame - self.frame > 1:
+                displacement /= frame - self.frame
+        if len(trackedIds):
+            self.nextId = max(self.nextId, int(trackedIds.max()) + 1)
+        self.pointCoords = np.array(pointCoords, dtype=np.float64)
+        self.particleIds = trackedIds
+        self.frame = frame
+        return trackedIds, displacement
@@ -0,0 +1,123 @@
+"""
+Point transforms.
+
+Point coordinates can be moved to scene space as they're written: scaled (uniformly by scaleFactor and per axis by
+scale), transformed by a 4x4 matrix, then offset. All of it is composed into a single affine transform, kept as a 4x3
+array: three rows for the linear part, then the translation, so that a block of points p becomes p.dot(A[:3]) + A[3].
+Matrices are given as in Maya (xform -query -matrix): points are row vectors and the translation is in the last row.
+
+Nothing transforms a whole frame at once. The transform is applied a block of points at a time, while the records are
+converted to big-endian for packing (see pdc.recordBlocks). With a crop (a box or a sphere, in transformed coordinates),
+each block is transformed once as the frame is filtered instead: it's tested against the crop, and the transformed
+coordinates of the points inside are kept to be packed as they are (see cropPoints). That's a copy of the points kept,
+in place of a second transform.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+
+blockSize = 1 << 18 # Points transformed at a time
+cropShapes = ('box', 'sphere')
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# A list of count floats, from a sequence of numbers (None stays None)
+def checkValues(values, count, name):
+    if values is None:
+        return None
+    try:
+        values = [float(value) for value in np.asarray(values, dtype=np.float64).reshape(-1)]
+    except (TypeError, ValueError):
+        values = []
+    if len(values) != count:
+        raise ValueError('{0} must be {1} numbers, not {2}.'.format(name, count, values))
+    return values
+
+# Checks the matrix, per-axis scale and offset of a transform. The matrix (16 numbers, flat or as 4 rows) must be an
+# affine one, with a last column of 0, 0, 0, 1.
+def checkTransform(matrix=None, scale=None, offset=None):
+    matrix = checkValues(matrix, 16, 'The transform matrix')
+    if matrix is not None:
+        if matrix[3::4] != [0.0, 0.0, 0.0, 1.0]:
+            raise ValueError('The transform matrix must be affine (last column 0, 0, 0, 1), not {0}.'.format(matrix))
+        matrix = [matrix[row:row + 4] for row in range(0, 16, 4)]
+    return matrix, checkValues(scale, 3, 'The scale'), checkValues(offset, 3, 'The offset')
+
+# Checks a crop spec: ['box', boxMin, boxMax] or ['sphere', center, radius] (None doesn't crop)
+def checkCrop(spec):
+    if spec is None:
+        return None
+    if not spec or spec[0] not in cropShapes or len(spec) != 3:
+        raise ValueError('Unknown crop: {0}. Use [\'box\', min, max] or [\'sphere\', center, radius].'.format(spec))
+    if spec[0] == 'box':
+        return ['box', checkValues(spec[1], 3, 'The crop box minimum'), checkValues(spec[2], 3, 'The crop box maximum')]
+    radius = float(spec[2])
+    if radius < 0:
+        raise ValueError('The crop sphere radius must be positive, not {0}.'.format(radius))
+    return ['sphere', checkValues(spec[1], 3, 'The crop sphere center'), radius]
+
+# Affine transform (4x3 array) of the point coordinates of a conversion: scaleFactor and the per-axis scale first, then
+# the matrix, then the offset. None when there's no matrix, scale or offset: points are then only multiplied by
+# scaleFactor, the way they always were.
+def pointTransform(options):
+    if options['matrix'] is None and options['scale'] is None and options['offset'] is None:
+        return None
+    affine = np.zeros((4, 3))
+    affine[:3] = np.diag(np.asarray(options['scale'] or [1.0, 1.0, 1.0]) * float(options['scaleFactor']))
+    if options['matrix'] is not None:
+        matrix = np.asarray(options['matrix'])
+        affine[:3] = np.dot(affine[:3], matrix[:3, :3])
+        affine[3] = matrix[3, :3]
+    if options['offset'] is not None:
+        affine[3] += options['offset']
+    return affine
+
+# Transform of vectors (e.g. velocities): the linear part of a transform, without its translation. A plain
+# multiplication factor stays as it is.
+def vectorTransform(factor):
+    if not isinstance(factor, np.ndarray):
+        return factor
+    linear = factor.copy()
+    linear[3] = 0.0
+    return linear
+
+# Transformed coordinates of points, a block of at most blockSize points at a time, as (start, block) pairs. Each block
+# is a new array; the points themselves are never modified or copied as a whole.
+def transformBlocks(pointCoords, affine, blockSize=blockSize):
+    affine = np.asarray(affine, dtype=np.float64)
+    for start in range(0, len(pointCoords), blockSize):
+        block = np.dot(pointCoords[start:start + blockSize], affine[:3])
+        block += affine[3]
+        yield start, block
+
+# Affine transform that a crop is tested in: the one points are written with (see pointTransform), or scaleFactor alone
+def cropTransform(options):
+    affine = pointTransform(options)
+    if affine is None:
+        affine = np.vstack([np.eye(3) * float(options['scaleFactor']), np.zeros(3)])
+    return affine
+
+# Crops points to a box or a sphere (see checkCrop) in the coordinates given by affine. keep, if given, is the keep-mask
+# of the other filters of the frame. Returns the keep-mask of the points that pass them and are inside the crop, and the
+# transformed coordinates of those points, ready to be packed. Each block of points is transformed once, for both.
+def cropPoints(pointCoords, affine, crop, keep=None):
+    keep = np.ones(len(pointCoords), dtype=bool) if keep is None else np.array(keep, dtype=bool)
+    kept = [np.empty((0, 3))]
+    for start, block in transformBlocks(pointCoords, affine):
+        if crop[0] == 'box':
+            outside = ((block < np.asarray(crop[1])) | (block > np.asarray(crop[2]))).any(axis=1)
+        else:
+            offsets = block - np.asarray(crop[1])
+            outside = np.einsum('ij,ij->i', offsets, offsets) > float(crop[2])**2
+        blockKeep = keep[start:start + len(block)]
+        blockKeep &= ~outside
+        kept.append(block[blockKeep])
+    return keep, np.concatenate(kept)
+
+# Vectors (e.g. velocities) as they're written with a transform or a plain multiplication factor (see vectorTransform),
+# as a new array. The same values as when they're transformed while packed.
+def transformVectors(vectors, factor):
+    factor = vectorTransform(factor)
+    if not isinstance(factor, np.ndarray):
+        return vectors * factor
+    return np.concatenate([np.empty((0, 3))] + [block for start, block in transformBlocks(vectors, factor)])
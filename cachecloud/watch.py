@@ -0,0 +1,186 @@
+"""
+Watch mode, for sequences that are still being captured.
+
+A SequenceWatcher lists the source directory with os.scandir every poll, and only stats the files of the sequence that
+aren't converted yet. A file is complete once its size and modification time haven't changed for settleTime seconds,
+or once it was last modified more than settleTime seconds ago (e.g. a file moved in from a finished capture).
+watchSequence converts each frame as soon as it's complete, into the PDC file (or nCache frame) it would get from
+convertSequence, and keeps the cache manifest up to date as it goes, so a watch that is stopped and started again
+carries on where it stopped.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import os
+import time
+
+from . import engine, manifest, metrics, sequence, tracking
+
+defaultPollInterval = 0.1  # Seconds between two listings of the source directory
+defaultSettleTime = 0.25   # Seconds a source file must stay the same to be complete
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Watcher
+# Finds the complete files of a sequence (prefix and extension) in sourceDir, from frame start to frame end (either one
+# open if None). poll() returns the frames that became complete since the last poll, as (frame number, path) pairs in
+# frame order; each of them is only returned once. With inOrder, a complete frame is held back while the file of an
+# earlier frame is still on its way, so that frames are returned in frame order across polls too.
+class SequenceWatcher(object):
+    def __init__(self, sourceDir, prefix, ext, start=None, end=None, settleTime=defaultSettleTime, clock=time.monotonic, inOrder=False):
+        self.sourceDir = sourceDir
+        self.prefix = prefix
+        self.ext = ext
+        self.start = start
+        self.end = end
+        self.settleTime = settleTime
+        self.clock = clock
+        self.inOrder = inOrder
+        self.held = []      # Complete frames held back until the earlier ones are complete, with inOrder
+        self.pending = {}   # File name: (size and modification time, when they were first seen)
+        self.done = set()   # Names of the files already returned
+        self.framesDone = set()
+        self.stamps = {}    # Modification time of the files returned, by path
+
+    def poll(self):
+        now = self.clock()
+        wallTime = time.time()
+        ready = []
+        seen = set()
+        for entry in os.scandir(self.sourceDir or '.'):
+            if entry.name in self.done:
+                continue
+            parts = sequence.splitFrameName(entry.name)
+            if parts is None or parts[0] != self.prefix or parts[2] != self.ext:
+                continue
+            frame = parts[1]
+            if (self.start is not None and frame < self.start) or (self.end is not None and frame > self.end):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError: # Gone since the listing
+                continue
+            seen.add(entry.name)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if entry.name not in self.pending or self.pending[entry.name][0] != stamp:
+                self.pending[entry.name] = (stamp, now)
+            settled = now - self.pending[entry.name][1] >= self.settleTime or wallTime - stat.st_mtime_ns / 1e9 >= self.settleTime
+            if stat.st_size and settled:
+                path = os.path.join(self.sourceDir, entry.name)
+                ready.append((frame, path))
+                self.done.add(entry.name)
+                self.framesDone.add(frame)
+                self.stamps[path] = stat.st_mtime_ns / 1e9
+                del self.pending[entry.name]
+        for name in set(self.pending) - seen: # Deleted or renamed before they were complete
+            del self.pending[name]
+        ready = sorted(self.held + ready)
+        self.held = []
+        if self.inOrder and self.pending:
+            firstPending = min(sequence.splitFrameName(name)[1] for name in self.pending)
+            self.held = [(frame, path) for frame, path in ready if frame > firstPending]
+            ready = [(frame, path) for frame, path in ready if frame < firstPending]
+        return ready
+
+    # Whether the last frame (end) was returned, and no other frame is on its way
+    def finished(self):
+        return self.end is not None and self.end in self.framesDone and not self.pending and not self.held
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Converts the frames of the sequence of firstFile as they land in its directory, from the frame of firstFile (or from
+# start) to end (or until stopped). Frames follow the frame numbers of the source files, as with convertSequence (see
+# sequence.outputFrames): the frame number of firstFile (or start) goes to firstFrame (default: the same number), and a
+# frame that never comes leaves a gap. Manifest entries of source files that went to other frames before are dropped,
+# with their files. It takes the same arguments as convertSequence, plus:
+# - pollInterval and settleTime (see SequenceWatcher). A frame is converted within about settleTime + pollInterval of
+#   its file being complete, and its summary gives the seconds from its last modification to its PDC file ('lag').
+# - idleTimeout: stop when no frame has come in for that many seconds (None waits for ever)
+# - stop: a threading.Event that stops the watch when it's set (a KeyboardInterrupt stops it too)
+# The form of array comes from the first complete file. Frames already up to date according to the manifest are
+# skipped, except when tracking particles, where every frame is converted again (the ids depend on all the frames
+# before). Particles are tracked in frame order: a frame is held back while the file of an earlier frame is still being
+# written, and a frame whose file only lands after a later frame was converted can't be tracked, so it fails (see
+# onError). Frames go to PDC files, or to an nCache with a file per frame, whose description is updated as they come in.
+# Returns the summaries of the frames, in the order they were converted.
+def watchSequence(firstFile, cacheoutputDir, pdcBasename, firstFrame=None, progress=None, onError='stop', hashSources=False,
+                  recorder=None, start=None, end=None, pollInterval=defaultPollInterval, settleTime=defaultSettleTime,
+                  idleTimeout=None, stop=None, **kwargs):
+    options = engine.makeOptions(**kwargs)
+    if onError not in ('stop', 'continue'):
+        raise ValueError('onError must be "stop" or "continue", not "{0}".'.format(onError))
+    if options['extraScalefactor'] == 'auto':
+        raise ValueError('The extra attribute can\'t be scaled automatically before the whole sequence is there.')
+    if options['cacheFormat'] != 'pdc' and options['cacheType'] == 'OneFile':
+        raise ValueError('A single file nCache can\'t be written while frames are still coming in.')
+    prefix, fileFrame, ext = sequence.checkFrameName(firstFile)
+    if start is not None:
+        fileFrame = start
+    if firstFrame is None:
+        firstFrame = fileFrame
+    watcher = SequenceWatcher(os.path.dirname(firstFile), prefix, ext, fileFrame, end, settleTime, inOrder=options['track'] is not None)
+    outputDirs = engine.outputDirectories(cacheoutputDir, options)
+    for outputDir in outputDirs:
+        if not os.path.exists(outputDir):
+            os.makedirs(outputDir)
+    manifestPath = manifest.manifestPath(outputDirs[0], pdcBasename)
+    cacheManifest = manifest.loadManifest(manifestPath, pdcBasename)
+    tracker = tracking.ParticleTracker(options['track']) if options['track'] is not None else None
+    timer = metrics.StageTimer()
+    layout = settings = writers = None
+    written = []
+    lastFrameTime = time.monotonic()
+    try:
+        while stop is None or not stop.is_set():
+            ready = watcher.poll()
+            if ready and layout is None:
+                layout = engine.analyzeSequence([ready[0][1]])[:2]
+                timer.lap('analyze')
+                settings = manifest.conversionSettings(options, layout[1])
+                writers = engine.cacheWriters(outputDirs, pdcBasename, layout[1], options)
+                if recorder is not None:
+                    recorder.record('sequenceStart', pdcBasename=pdcBasename, cacheoutputDir=cacheoutputDir, outputDirs=outputDirs,
+                                    frames=None, firstFrame=firstFrame, arrayForm=layout[1], workers=1, pipelineDepth=0,
+                                    settings=settings, analyzeSeconds=timer.seconds['analyze'], watch=True)
+            for fileFrameNumber, sourcefile in ready:
+                frame = firstFrame + fileFrameNumber - fileFrame
+                outputPath = engine.frameOutputPath(outputDirs, pdcBasename, frame, options)
+                fileName = os.path.basename(engine.outputPaths(outputPath)[0])
+                manifest.pruneMoved(cacheManifest, {sourcefile: fileName}, outputDirs)
+                entry = cacheManifest['frames'].get(fileName)
+                if tracker is None and manifest.isUpToDate(entry, sourcefile, outputPath, settings, hashSources):
+                    frameInfo = {'sourcefile': sourcefile, 'outputPath': engine.outputPaths(outputPath)[0], 'skipped': True,
+                                 'points': entry['points'], 'removed': entry['removed'], 'bytes': entry['bytes']}
+                    if 'stats' in entry:
+                        frameInfo['stats'] = entry['stats']
+                else:
+                    frameInfo = engine.tryConvertFrame(sourcefile, outputPath, layout[0], layout[1], options, frame, onError, tracker, writers)
+                    frameInfo['lag'] = time.time() - watcher.stamps[sourcefile]
+                if 'error' in frameInfo:
+                    cacheManifest['frames'].pop(fileName, None)
+                else:
+                    if not frameInfo.get('skipped'):
+                        cacheManifest['frames'][fileName] = manifest.frameEntry(frameInfo, settings, hashSources)
+                    for writer in writers or []:
+                        writer.frames.add(frame)
+                written.append(frameInfo)
+                if recorder is not None:
+                    recorder.record('frame', **metrics.frameRecord(len(written) - 1, frameInfo))
+                if progress is not None:
+                    progress(frameInfo)
+            if ready:
+                manifest.saveManifest(manifestPath, cacheManifest)
+                for writer in writers or []:
+                    writer.close() # Only rewrites the description, with the frames so far
+                lastFrameTime = time.monotonic()
+                continue
+            if watcher.finished() or (idleTimeout is not None and time.monotonic() - lastFrameTime >= idleTimeout):
+                break
+            time.sleep(pollInterval)
+    except KeyboardInterrupt: # The frame being converted, if any, is left out of the manifest and converted next time
+        pass
+    finally:
+        manifest.saveManifest(manifestPath, cacheManifest)
+        if recorder is not None and layout is not None:
+            engine.recordSequenceEnd(recorder, pdcBasename, written, len(written), timer)
+    return written
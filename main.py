@@ -26,7 +26,7 @@ Notes:
     *per line, comma-separated or whitespace-separated. Try another form of arrays at your own risk.
 4) There's a bug that makes Maya crash when you play the animation past the last frame of the cache. The script automatically sets it to the appropriate timeslider range, so in the meantime just avoid changing the timeslider playback range.  
 5) For a single point cloud, the extra attribute selected is added automatically; for animated point clouds, you need to manually add the selected attribute after closing Cache Cloud.
-6) Be aware that this script creates a new cache folder and a CacheCloud_history.txt file in your Maya workspace (in the particles directory).
+6) Be aware that this script creates a new cache folder and a CacheCloud_history.jsonl file (a JSON record of each session and frame) in your Maya workspace (in the particles directory).
 7) This script has only been tested in 64-bit Maya 2011 running on OSX, but I don't see why it wouldn't work in Windows. The UI prompts are called from Maya commands.
 
 License: 
@@ -47,111 +47,25 @@ Things to do:
 #----------------------------------------------------------------------------------------------------------------------------
 ### Imports
 import os                             
-from struct import *
 import maya.cmds as mc
 import datetime
+from cachecloud.formats import arrayForm, parseLines, openSource
+from cachecloud.engine import zerosCount, removeZeroPoints, convertSequence, sequenceStats
+from cachecloud.stats import valueStats
+from cachecloud.mayaimport import importPointCloud
+from cachecloud.metrics import Recorder, JsonLinesSink, RateLimitedProgress
+from cachecloud.sequence import frameNumber, namePrefix, fileExtension, sortByFrame, sequenceFiles, outputFrames
 # from binascii import hexlify # To represent binary data in hexadecimal. Could be useful in debugging.
 
 #----------------------------------------------------------------------------------------------------------------------------
 ### Define functions
-# Checking the numerical contents of a string without changing the type
-def checkNum(strContent):
-    t = strContent.strip()
-    if t.isdigit(): 
-        return 'integer'
-    else: 
-        return 'float'
-
-# For data structure (i.e. form of array) analysis
-def arrayForm(contentSampling):
-    sample = contentSampling[len(contentSampling)//2] # Arbitrary point (median index, in this case) is used for analysis. (This analysis could probably be better done with other statistical methods.)
-    if sample.count(',') > 1: # Analyze comma-separated values. 
-        if len(sample.split(',')) == 4:
-            pointData = sample.split(',')
-            if checkNum(pointData[0]) == 'integer':
-                return 'commas',acceptableArrayforms['i3fC'], 4
-            elif checkNum(pointData[0]) == 'float': 
-                return 'commas', acceptableArrayforms['3fiC'], 4
-            else:
-                return None,acceptableArrayforms['u'], None
-        elif len(sample.split(',')) == 3:
-            pointData = sample.split(',')
-            if checkNum(pointData[0]) == 'float': 
-                return 'commas',acceptableArrayforms['3fC'], 3
-            else:
-                return None,acceptableArrayforms['u'], None
-    elif sample.count(' ') > 1: # Analyze space-separated values
-        if len(sample.split(' ')) == 4:
-            pointData = sample.split(' ')
-            if checkNum(pointData[0]) == 'integer':
-                return 'spaces',acceptableArrayforms['i3f'], 4
-            elif checkNum(pointData[0]) == 'float': 
-                return 'spaces',acceptableArrayforms['3fi'], 4
-            else:
-                return None,acceptableArrayforms['u'], None
-        elif len(sample.split(' ')) == 3:
-            pointData = sample.split(' ')
-            if checkNum(pointData[0]) == 'float': 
-                return 'spaces',acceptableArrayforms['3f'], 3
-            else:
-                return None,acceptableArrayforms['u'], None
-    else:
-        return None,acceptableArrayforms['u'], None
-
-def makePointcoords(arrayFormResult):  
-    if point == '':
-        content.remove('')
-    elif arrayDelimiter == 'commas':
-        pointData = point.split(',')
-        if arrayFormResult == acceptableArrayforms['i3fC']:
-            pointPos = float(pointData[1]), float(pointData[2]), float(pointData[3])
-            pointCoords.append(pointPos)
-            extraAttrValues.append(float(pointData[0]))  
-        elif arrayFormResult == acceptableArrayforms['3fiC']: 
-            pointPos = float(pointData[0]), float(pointData[1]), float(pointData[2])
-            pointCoords.append(pointPos)
-            extraAttrValues.append(float(pointData[3])) 
-        elif arrayFormResult == acceptableArrayforms['3fC']: 
-            pointPos = float(pointData[0]), float(pointData[1]), float(pointData[2])
-            pointCoords.append(pointPos)
-    elif arrayDelimiter == 'spaces':
-        pointData = point.split(' ')
-        if arrayFormResult == acceptableArrayforms['i3f']:
-            pointPos = float(pointData[1]), float(pointData[2]), float(pointData[3])
-            pointCoords.append(pointPos)
-            extraAttrValues.append(float(pointData[0]))
-        elif arrayFormResult == acceptableArrayforms['3fi']: 
-            pointPos = float(pointData[0]), float(pointData[1]), float(pointData[2])
-            pointCoords.append(pointPos)
-            extraAttrValues.append(float(pointData[3])) 
-        elif arrayFormResult == acceptableArrayforms['3f']: 
-            pointPos = float(pointData[0]), float(pointData[1]), float(pointData[2])
-            pointCoords.append(pointPos)
-            
-# Function for setting the PDC file incremental value according to frame rate
-def pdcfileStep(frameRate):
-    if frameRate == 'pal': 
-        return 240
-    elif frameRate == 'ntsc': 
-        return 200
-    elif frameRate == 'film': 
-        return 250
-    elif frameRate == 'palf': 
-        return 120
-    elif frameRate == 'ntscf': 
-        return 100
-    elif frameRate == 'show': 
-        return 125
-    else: 
-        return 200
-        
 def exitPrompt():
     surePrompt = mc.confirmDialog( icn = 'warning', title='Leaving Cache Cloud...', message='Sure you want to stop here?', button=['Go Back','Stop'], defaultButton='Go Back', cancelButton='Stop', dismissString='Stop' )
     if surePrompt == 'Go Back':
         return True
     else:
         print("*** Goodbye.")
-        #historyLog.write('{0}\n\n\n'.format((datetime.datetime.now()).strftime("SESSIONEND\tNo particles created. User exited: %Y-%m-%d %H:%M:%S")))
+        #historyLog.record('sessionEnd', result='No particles created. User exited')
         return False
 ### Initiate-------------------------------------------------------------------------------------------------------------------
 versionNum = '0.8.4'
@@ -159,20 +73,7 @@ print('*** Welcome to Cache Cloud version {0} ***'.format(versionNum))
 # Prepare the directory for particle disk cache (PDC) files
 projectrootDir = str(mc.workspace(q=1,rootDirectory=1)) 
 particlesDir =  projectrootDir + 'particles/'
-if os.path.isfile(particlesDir + 'CacheCloud_history.txt'): # Record session in history log
-    historyLog = open(particlesDir + 'CacheCloud_history.txt', 'a') # If file exists, append write
-else:
-    historyLog = open(particlesDir + 'CacheCloud_history.txt', 'w') # If file doesn't exist, create new and write
-    historyLog.write('{0} Cache Cloud {1} {2}\n'.format('*'*6, versionNum,'*'*6 )) # Write title and general info
-    historyLog.write('Written by Daniel Vasquez\nEmail: dan@heylight.com\n\n')
-    historyLog.write('History log:\n\n')
-acceptableArrayforms = {'i3fC': 'int, float, float, float',
-                            '3fiC': 'float, float, float, int',
-                            '3fC': 'float, float, float', 
-                            'i3f': 'int float float float',
-                            '3fi': 'float float float int',
-                            '3f':'float float float',
-                            'u': 'unknown'}
+historyLog = Recorder([JsonLinesSink(particlesDir + 'CacheCloud_history.jsonl')]) # Record session in history log, one JSON record per line. The file is only opened when records get written.
 pointCoords = []  
 extraAttrValues = []
 cleanPrompt = None
@@ -182,9 +83,8 @@ while surePrompt:
     importChoice = mc.confirmDialog(icn='information',title='Welcome to Cache Cloud!',message="Create PDC files from a point cloud animation or\nimport point cloud single.",button=['Animation', 'Single', 'Cancel'],defaultButton='Animation',cancelButton='Cancel',dismissString='Cancel')
     if importChoice == 'Animation':
         sourceFiles = mc.fileDialog2(fm=4, ds = 2, okc = 'Select', cap = 'Select the first file in the point cloud animation or a range of files') 
-        try:
-            sourceFiles.sort() # Sort files in order - important for timeslider range
-        except: AttributeError
+        if sourceFiles is not None:
+            sourceFiles = sortByFrame(sourceFiles) # Sort files in frame order - important for timeslider range
         if sourceFiles == None:
             surePrompt = exitPrompt()
         else:
@@ -298,95 +198,67 @@ if importChoice == 'Animation':
         ### Make a list of the source files and analyze data structure to clean up
         #Extract information from the first file
         if len(sourceFiles) == 1: # If only one file was selected, use all relevant files in the directory. Otherwise, keep sourceFiles as is.
-            namePrefix = ( ''.join(i for i in os.path.split(sourceFiles[0])[1] if not i.isdigit()) ).split('.')[0] # Get the prefix name
-            firstFrame = int(''.join(i for i in os.path.split(sourceFiles[0])[1] if i.isdigit()))
-            #sourcefileDir = os.path.split(sourceFiles[0])[0] # This is just in case someone gets confused with the expression below to re-assign sourceFiles. (No idea how I managed this one. Basically, it makes a list of all the files in the remaining sequence with the same prefix name.)
-            sourceFiles = [(os.path.split(sourceFiles[0])[0] + '/' + f)  # Selected directory + f
-                             for f in os.listdir(os.path.split(sourceFiles[0])[0]) # Make list: For f in [all files in selected directory]
-                             if f.startswith(namePrefix) and # Only if f starts with the same namePrefix
-                             os.path.isfile(os.path.split(sourceFiles[0])[0] + '/' + f) and # and if f is an actual file 
-                             firstFrame <= int(''.join(i for i in f if i.isdigit())) ] # and if f is greater than the selected file. 
-            inFile = open(str(sourceFiles[0]), 'r') # Make a list of its contents (i.e. assign content)
+            sourcePrefix = namePrefix(sourceFiles[0]) # Get the prefix name
+            firstFrame = frameNumber(sourceFiles[0])
+            sourceFiles = sequenceFiles(sourceFiles[0]) # Make a list of all the files in the remaining sequence with the same prefix name, in frame order
+            inFile = openSource(sourceFiles[0]) # Make a list of its contents (i.e. assign content)
             fileContent = inFile.read()
             content = fileContent.split("\n") 
             inFile.close()
             del fileContent # Free up memory 
             print('*** Single file in the data sequence was selected. Using all files in same sequence.')
             # Clean up some points
-            arrayDelimiter = arrayForm(content)[0]
-            arrayFormResult = arrayForm(content)[1]
-            [makePointcoords(arrayFormResult) for point in content]# Function that collects pointCoords data
-            zerosCount = len([x for x in pointCoords if sum(x) ==0]) # Get the offset of every zero-value point  
-            if zerosCount > 0:     
-                cleanPrompt = mc.confirmDialog(icn = 'warning', title='Clean Up', message='After looking at the data in "{1}", {0} points were found to have zero-value.\nRemove all zero-value points?'.format(zerosCount, os.path.split(sourceFiles[0])[1]), button=['Remove','Keep'], defaultButton='Keep', cancelButton='Keep', dismissString='Keep' )
+            arrayDelimiter, arrayFormResult, detectedLength = arrayForm(content) # Analyze the form of array once for the whole sequence
+            pointCoords, extraAttrValues = parseLines(content, arrayDelimiter, arrayFormResult) # Collect pointCoords and extraAttrValues data
+            zeroPoints = zerosCount(pointCoords) # Get the number of zero-value points
+            if zeroPoints > 0:     
+                cleanPrompt = mc.confirmDialog(icn = 'warning', title='Clean Up', message='After looking at the data in "{1}", {0} points were found to have zero-value.\nRemove all zero-value points?'.format(zeroPoints, os.path.split(sourceFiles[0])[1]), button=['Remove','Keep'], defaultButton='Keep', cancelButton='Keep', dismissString='Keep' )
                 if cleanPrompt == 'Remove':
-                    print('*** {0} zero-value points will be removed.'.format(zerosCount))
+                    print('*** {0} zero-value points will be removed.'.format(zeroPoints))
                 else:
                     print('*** There are zero-values that will not be removed.')
             sourceDir= os.path.split(sourceFiles[0])[0] + '/'
         elif len(sourceFiles) > 1: # Keep sourceFiles as is.
-            namePrefix = ( ''.join(i for i in os.path.split(sourceFiles[0])[1] if not i.isdigit()) ).split('.')[0] # Get the prefix name
+            sourcePrefix = namePrefix(sourceFiles[0]) # Get the prefix name
             print('*** A range of files in the data sequence was selected.') # If a range of files was selected, use those files only
-            inFile = open(str(sourceFiles[0]), 'r') # Make a list of its contents (i.e. assign content)
+            inFile = openSource(sourceFiles[0]) # Make a list of its contents (i.e. assign content)
             fileContent = inFile.read()
             content = fileContent.split("\n") 
             inFile.close()
             del fileContent # Free up memory
              # Clean up some points
-            arrayDelimiter = arrayForm(content)[0]
-            arrayFormResult = arrayForm(content)[1]
-            [makePointcoords(arrayFormResult) for point in content]# Function that collects pointCoords data
-            zerosCount = len([x for x in pointCoords if sum(x) ==0])  # Get the offset of every zero-value point   
-            if zerosCount > 0:  
-                cleanPrompt = mc.confirmDialog(icn = 'warning', title='Clean Up', message='After looking at the data in "{1}", {0} points were found to have zero-value.\nRemove all zero-value points?'.format(zerosCount, os.path.split(sourceFiles[0])[1]), button=['Remove','Keep'], defaultButton='Keep', cancelButton='Keep', dismissString='Keep' )
+            arrayDelimiter, arrayFormResult, detectedLength = arrayForm(content) # Analyze the form of array once for the whole sequence
+            pointCoords, extraAttrValues = parseLines(content, arrayDelimiter, arrayFormResult) # Collect pointCoords and extraAttrValues data
+            zeroPoints = zerosCount(pointCoords) # Get the number of zero-value points
+            if zeroPoints > 0:  
+                cleanPrompt = mc.confirmDialog(icn = 'warning', title='Clean Up', message='After looking at the data in "{1}", {0} points were found to have zero-value.\nRemove all zero-value points?'.format(zeroPoints, os.path.split(sourceFiles[0])[1]), button=['Remove','Keep'], defaultButton='Keep', cancelButton='Keep', dismissString='Keep' )
                 if cleanPrompt == 'Remove':
                     print('*** Zero-value points will be removed.')
                 else:
                     print('*** There are zero-values that will not be removed.')
             sourceDir= os.path.split(sourceFiles[0])[0] + '/'
-            firstFrame = int(''.join(i for i in os.path.split(sourceFiles[0])[1]if i.isdigit()))
-        fileExt = '.' + ( ''.join(i for i in os.path.split(sourceFiles[0])[1] if not i.isdigit()) ).split('.')[1]    # File extension
+            firstFrame = frameNumber(sourceFiles[0])
+        fileExt = fileExtension(sourceFiles[0])    # File extension
         ### Set up timeslider depending on number of source files (i.e. sourceFiles). (This section is questionable and might not even be necessary.)
         framesCount = len(sourceFiles)  
         startFrame = mc.playbackOptions(e=1, ast= firstFrame)
-        endFrame = mc.playbackOptions(e=1, animationEndTime = firstFrame + framesCount - 1)
+        endFrame = mc.playbackOptions(e=1, animationEndTime = outputFrames(sourceFiles, firstFrame)[-1]) # Gaps in the sequence stay gaps in the cache
         mc.playbackOptions(e=1, min=startFrame)
         mc.playbackOptions(e=1, max=endFrame)  # The minus 2 buffer is a temporary fix to the issue of Maya crashing at the last frame.
         mc.currentTime(startFrame)
         # Create a default particle disk cache (which will be overwritten)
         mc.dynExport( particlesName, path = sceneName,  f = 'cache', mnf = firstFrame, mxf = endFrame, oup = 0)
     #-----------------------------------------------------------------------------------------------------------------     
-        ### This is where it all the magic happens! Writing the PDC files in binary...
-        # Assign default header values for writing binary PDC file
-        fileType = 'PDC '
-        formatVersion = 1
-        byteOrder = 1
-        extra1 = 0
-        extra2 = 0 
-        dataType = {'Integer': 0, 
-                    'Integer Array': 1,
-                    'Double': 2,
-                    'Double Array': 3,
-                    'Vector': 4, 
-                    'Vector Array': 5}
-        # This is important for naming the PDC files in a specific incremental value
-        pdcNameIncrementsValue = pdcfileStep(frameRate)
-        pdcIncrements = firstFrame * pdcNameIncrementsValue
-        offset = -1 # This is if the arrayLength is 3
-        writtenPDCCount = 0
-        arrayDelimiter = arrayForm(content)[0]
-        arrayFormResult = arrayForm(content)[1]
-        if arrayForm(content)[2] == 4:
-            print('*** The following form of array was detected: {0}'.format(arrayForm(content)[1]))
+        if detectedLength == 4:
+            print('*** The following form of array was detected: {0}'.format(arrayFormResult))
             extraAttr = mc.confirmDialog( title='Extra attribute', message='There was an extra integer value detected in the arrays. Assign it to an attribute?', button=['radiusPP','opacityPP', 'rotationPP', 'SKIP' ], defaultButton='SKIP', cancelButton='SKIP', dismissString='SKIP' )
-            extraAttrValues = []
-            [makePointcoords(arrayFormResult) for point in content]# Function to collects extraAttrValues data
-            avgAttrvalues = sum(extraAttrValues)/len(extraAttrValues)
-            maxAttrValue = max(extraAttrValues)
-            #minAttrValue = min(extraAttrValues)
             if extraAttr == 'SKIP': # If no attribute was chosen , make the arrayLength = 3
                 arrayLength = 3
             else:
+                extraStats = sequenceStats(sourceFiles, frameStore=cacheoutputDir + 'frameStore', cleanup=(cleanPrompt == 'Remove')).extra # Whole sequence in one pass. The parsed frames are kept in the frame store for the conversion.
+                avgAttrvalues = extraStats['mean']
+                maxAttrValue = extraStats['max']
+                #minAttrValue = extraStats['min']
                 while surePrompt:
                     scalefactorPrompt = mc.promptDialog(title='Scale attribute',text = '{0}'.format(str(1/maxAttrValue)),message='The highest value of {0} is {2}. The average value is {1:.2f}.\n Scale it by:'.format(extraAttr,avgAttrvalues, maxAttrValue),button=['OK', 'Cancel'],defaultButton='OK',cancelButton='Cancel',dismissString='Cancel')
                     if scalefactorPrompt == 'OK':
@@ -399,102 +271,29 @@ if importChoice == 'Animation':
                     elif scalefactorPrompt == 'Cancel':
                         surePrompt = exitPrompt()
                 print('*** The extra integer value has been assigned to the attribute: {0}.'.format(extraAttr))  
-                arrayLength = arrayForm(content)[2] # This should reference to 4
+                arrayLength = detectedLength # This should reference to 4
         else:
-            arrayLength = arrayForm(content)[2] # This should reference to 3
-            print('*** The following form of array was detected: {0}'.format(arrayForm(content)[1]))
+            arrayLength = detectedLength # This should reference to 3
+            print('*** The following form of array was detected: {0}'.format(arrayFormResult))
         print('*** Beginning to write PDC files. This may take some time...')
-        print(datetime.datetime.now()).strftime("*** Started: %Y-%m-%d %H:%M:%S")
-        historyLog.write('{0}\n'.format((datetime.datetime.now()).strftime("SESSIONSTART    Started creating PDC files: %Y-%m-%d %H:%M:%S")))
-        historyLog.write('INPUT\t{0} files ({3}) with root name "{1}" from {2}\n'.format(str(len(sourceFiles)),namePrefix,sourceDir,fileExt))
+        print(datetime.datetime.now().strftime("*** Started: %Y-%m-%d %H:%M:%S"))
+        historyLog.record('sessionStart', version=versionNum, importChoice=importChoice, files=len(sourceFiles), sourcePrefix=sourcePrefix, sourceDir=sourceDir, fileExt=fileExt)
     #-----------------------------------------------------------------------------------------------------------------     
-        # Loop for each file to make a PDC file.
-        for sourcefile in sourceFiles:
-            inFile = open(str(sourcefile), 'r')
-            fileContent = inFile.read()
-            inFile.close()
-            content = fileContent.split("\n") # Note: content object gets re-assigned here
-            del fileContent # Free up memory
-            pointCoords = []  
-            extraAttrValues = []
-            
-            for point in content: 
-                makePointcoords(arrayFormResult) # Function that collects pointCoords data
-                
-            particleIds = range(len(pointCoords)) 
-            if cleanPrompt == 'Remove': # Clean up zero-point values if user chose 'Remove' in cleanPrompt above
-                particleIds = [pointCoords.index(x) for x in pointCoords if sum(x) !=0] # Collect offsets that correspond to nonzero-value points to use as particleIds
-                #print('///{1} points were removed from {0}'.format(os.path.split(sourcefile)[1],len([pointCoords.index(x) for x in pointCoords if sum(x) ==0]))) 
-                historyLog.write('OUTPUT\t{1} points were removed from {0}\n'.format(os.path.split(sourcefile)[1],len([x for x in pointCoords if sum(x) == 0]))) 
-                pointCoords = [x for x in pointCoords if sum(x) !=0] # Filter out all zero-value pointsparticlesTotal = len(pointCoords)
-            if arrayLength == 4:
-                extraAttrValuesR = []
-                [extraAttrValuesR.append(extraAttrValues[i]*float(extraScalefactor)) for i in particleIds]
-                extraAttrValues = extraAttrValuesR
-                
-            attributes = ['position','particleId']
-            attrValues = [pointCoords, particleIds]
-            particlesTotal = len(pointCoords)
-            if arrayLength == 4:
-                offset = 0
-                attributes = [str(extraAttr)] + attributes
-                attrValues = [extraAttrValues] + attrValues  # The extra attribute values are collected in the makePointcoords() function
-                recordsValues1 = (len(attributes[0]),
-                              attributes[0],
-                              dataType['Double Array'])
-                for i in extraAttrValues: 
-                    recordsValues1 += float(i),
-                    
-                recordsFormExtra = ' i{0}si{1}d'.format(str(len(attributes[0])),
-                                                    str(len(extraAttrValues)) )
-            # Assign records values
-            recordsValues2 = (len(attributes[1 + offset]),
-                              attributes[1 + offset],
-                              dataType['Vector Array'])
-            scaleFactor = 1
-            for coord in pointCoords:
-                recordsValues2 += coord[0]*scaleFactor,coord[1]*scaleFactor,coord[2]*scaleFactor
-            
-            recordsValues3 = (len(attributes[2 + offset]),
-                              attributes[2 + offset],
-                              dataType['Double Array'])
-            for i in particleIds: 
-                recordsValues3 += float(i),
-            headerForm = '>4sii2iii'  
-            attributesTotal = len(attributes)       
-            headerValues = (fileType,
-                            formatVersion,
-                            byteOrder,
-                            extra1,
-                            extra2,
-                            particlesTotal,
-                            attributesTotal)   
-            recordsForm = ' i{0}si{1}d i{2}si{3}d'.format(str(len(attributes[1 + offset])),
-                                                          str(3* particlesTotal),
-                                                          str(len(attributes[2 + offset])),
-                                                          str(len(particleIds))  )
-            # Pack the binary data into the PDC files
-            if arrayLength == 4:
-                form = Struct(headerForm + recordsFormExtra + recordsForm)
-                allValues = headerValues + recordsValues1 + recordsValues2 + recordsValues3
-            elif arrayLength == 3:
-                form = Struct(headerForm + recordsForm)
-                allValues = headerValues + recordsValues2 + recordsValues3
-            packedData = form.pack(*allValues)
-            fileName = pdcBasename + '.' + str(pdcIncrements) + ".pdc"
-            outputPDCfile = open(cacheoutputDir + fileName, 'wb')
-            outputPDCfile.write(packedData)
-            outputPDCfile.close()
-            #historyLog.write('OUTPUT    Source file {0}: {1}\n'.format(os.path.split(sourcefile)[1], cacheoutputDir + fileName) )
-            print('// Writing PDC file from {0}: {1}'.format(os.path.split(sourcefile)[1], cacheoutputDir + fileName) )
-            pdcIncrements += pdcNameIncrementsValue     # Add value according to frameRate
-            writtenPDCCount  += 1
+        ### This is where it all the magic happens! Writing the PDC files in binary...
+        def writeProgress(status): # Printing to the Script Editor is slow, so only every few seconds (see RateLimitedProgress)
+            print('// Writing PDC files: {0}/{1} done, last from {2}: {3}'.format(status['done'], status['total'], os.path.split(status['frameInfo']['sourcefile'])[1], status['frameInfo']['outputPath']))
+        writeProgress = RateLimitedProgress(writeProgress, len(sourceFiles), 2.0)
+        if arrayLength == 4:
+            writtenPDCs = convertSequence(sourceFiles, cacheoutputDir, pdcBasename, firstFrame=firstFrame, progress=writeProgress, recorder=historyLog, pipelineDepth=2, frameStore=cacheoutputDir + 'frameStore', frameRate=frameRate, cleanup=(cleanPrompt == 'Remove'), extraAttr=extraAttr, extraScalefactor=float(extraScalefactor))
+            attributes = [str(extraAttr), 'position', 'particleId']
+        else:
+            writtenPDCs = convertSequence(sourceFiles, cacheoutputDir, pdcBasename, firstFrame=firstFrame, progress=writeProgress, recorder=historyLog, pipelineDepth=2, frameStore=cacheoutputDir + 'frameStore', frameRate=frameRate, cleanup=(cleanPrompt == 'Remove'))
+            attributes = ['position', 'particleId']
+        writtenPDCCount = len(writtenPDCs)
+        particlesTotal = writtenPDCs[-1]['points']
         break    
     if surePrompt:
-        historyLog.write('OUTPUT\t{0} PDC files have been written to {1}\n'.format(str(writtenPDCCount),cacheoutputDir))
-        #historyLog.write('HEADER\tType = {0}\nHEADER\tFormat version = {1}\nHEADER\tByte order = {2}\nHEADER\tExtra1 = {3}\nHEADER\tExtra2 = {4}\n'.format(fileType,formatVersion, byteOrder,extra1,extra2))
-        historyLog.write('RECORDS\tTotal points = {0}\nRECORDS\tAttributes assigned = {1}\n'.format(str(particlesTotal),attributes))
-        historyLog.write('{0}\n\n\n'.format((datetime.datetime.now()).strftime("SESSIONEND\tPDC files completed: %Y-%m-%d %H:%M:%S")))
+        historyLog.record('sessionEnd', result='PDC files completed', pdcFiles=writtenPDCCount, cacheoutputDir=cacheoutputDir, particlesTotal=particlesTotal, attributes=attributes)
         print('*** Your particle disk cache has been created. Thanks for using Cache Cloud!\n\n')
         finalPrompt = mc.confirmDialog(title='Done.', message='Your particle disk cache has been created.\nThanks for using Cache Cloud!', button=['Close','Heylight.com'], defaultButton='Close', cancelButton='Close', dismissString='Close' )
         if finalPrompt == 'Close':
@@ -512,36 +311,34 @@ if importChoice == 'Animation':
 
 ### If importing a single point cloud ---------------------------------------------------------------------------------------------------------------- 
 elif importChoice == 'Single':
-    inFile = open(str(sourceFiles[0]), 'r')
+    inFile = openSource(sourceFiles[0])
     fileContent = inFile.read()
     inFile.close()
     content = fileContent.split("\n") # Note: content object gets re-assigned here
     del fileContent # Free up memory
-    arrayDelimiter = arrayForm(content)[0]
-    arrayFormResult = arrayForm(content)[1]
+    arrayDelimiter, arrayFormResult, detectedLength = arrayForm(content)
     if arrayFormResult == 'unknown':
-        abortPrompt = mc.confirmDialog(title='Aborting', message='An {0} form of array was detected. Aborting Cache Cloud.'.format(arrayForm(content)[1]), button=['Close'], defaultButton='Close', cancelButton='Close', dismissString='Close' )    
-        print('*** An {0} form of array was detected. Aborted Cache Cloud.'.format(arrayForm(content)[1]))
+        abortPrompt = mc.confirmDialog(title='Aborting', message='An {0} form of array was detected. Aborting Cache Cloud.'.format(arrayFormResult), button=['Close'], defaultButton='Close', cancelButton='Close', dismissString='Close' )    
+        print('*** An {0} form of array was detected. Aborted Cache Cloud.'.format(arrayFormResult))
         surePrompt = False
-    print(datetime.datetime.now()).strftime("// Started: %Y-%m-%d %H:%M:%S")
-    historyLog.write('{0}\n'.format((datetime.datetime.now()).strftime("SESSIONSTART    Created single point cloud: %Y-%m-%d %H:%M:%S")))
-    for point in content: 
-        makePointcoords(arrayFormResult) # Function that collects pointCoords and extraAttrValues data
+    print(datetime.datetime.now().strftime("// Started: %Y-%m-%d %H:%M:%S"))
+    historyLog.record('sessionStart', version=versionNum, importChoice=importChoice, sourcefile=sourceFiles[0])
+    pointCoords, extraAttrValues = parseLines(content, arrayDelimiter, arrayFormResult) # Collect pointCoords and extraAttrValues data
     particleIds = range(len(pointCoords)) 
     #if surePrompt: # I think this surePrompt is totally unnecessary. Remove later, and test.
-    zerosCount = len([x for x in pointCoords if sum(x) ==0])  # Get the offset of every zero-value point   
-    if zerosCount > 0:  
-        cleanPrompt = mc.confirmDialog(icn = 'warning', title='Clean Up', message='After looking at the data in "{1}", {0} points were found to have zero-value.\nRemove all zero-value points?'.format(zerosCount, os.path.split(sourceFiles[0])[1]), button=['Remove','Keep'], defaultButton='Keep', cancelButton='Keep', dismissString='Keep' )
+    zeroPoints = zerosCount(pointCoords) # Get the number of zero-value points
+    if zeroPoints > 0:  
+        cleanPrompt = mc.confirmDialog(icn = 'warning', title='Clean Up', message='After looking at the data in "{1}", {0} points were found to have zero-value.\nRemove all zero-value points?'.format(zeroPoints, os.path.split(sourceFiles[0])[1]), button=['Remove','Keep'], defaultButton='Keep', cancelButton='Keep', dismissString='Keep' )
         if cleanPrompt == 'Remove':
             print('*** Zero-value points will be removed.')
         else:
             print('*** There are zero-values that will not be removed.')
-    historyLog.write('INPUT\tSingle point-cloud data file: {0}\n'.format(str(sourceFiles[0])))
-    if arrayForm(content)[2] == 4:
-        print('*** The following form of array was detected: {0}'.format(arrayForm(content)[1]))
+    if detectedLength == 4:
+        print('*** The following form of array was detected: {0}'.format(arrayFormResult))
         extraAttr = mc.confirmDialog( title='Extra attribute', message='There was an extra integer value detected in the arrays. Assign it to an attribute?', button=['radiusPP','opacityPP', 'mass', 'SKIP' ], defaultButton='SKIP', cancelButton='SKIP', dismissString='SKIP' )
-        maxAttrValue = max(extraAttrValues)
-        avgAttrvalues = sum(extraAttrValues)/len(extraAttrValues)
+        extraStats = valueStats(extraAttrValues)
+        maxAttrValue = extraStats['max']
+        avgAttrvalues = extraStats['mean']
         if extraAttr == 'SKIP': # If no attribute was chosen , make the arrayLength = 3
             arrayLength = 3
         else:
@@ -557,29 +354,21 @@ elif importChoice == 'Single':
                 elif scalefactorPrompt == 'Cancel':
                     surePrompt = exitPrompt()
             print('*** The extra integer value has been assigned to the attribute: {0}.'.format(extraAttr))  
-            arrayLength = arrayForm(content)[2] # This should reference to 4
+            arrayLength = detectedLength # This should reference to 4
     else:
-        arrayLength = arrayForm(content)[2] # This should reference to 3
-        print('*** The following form of array was detected: {0}'.format(arrayForm(content)[1]))
+        arrayLength = detectedLength # This should reference to 3
+        print('*** The following form of array was detected: {0}'.format(arrayFormResult))
     if cleanPrompt == 'Remove': # Clean up zero-point values if user chose 'Remove' in cleanPrompt above
-        particleIds = [pointCoords.index(x) for x in pointCoords if sum(x) !=0] # Collect offsets that correspond to nonzero-value points to use as particleIds
-        #print('///{1} points were removed from {0}'.format(os.path.split(sourcefile)[1],len([pointCoords.index(x) for x in pointCoords if sum(x) ==0]))) 
-        historyLog.write('OUTPUT\t{1} points were removed from data in {0}\n'.format(os.path.split(sourceFiles[0])[1],len([x for x in pointCoords if sum(x) == 0]))) 
-        pointCoords = [x for x in pointCoords if sum(x) !=0] # Filter out all zero-value pointsparticlesTotal = len(pointCoords)
-    mc.particle(n= os.path.split(sourceFiles[0])[1].split('.')[0]+'particle',position = pointCoords)# create particles with same name as source file
+        pointCoords, particleIds, extraAttrValues = removeZeroPoints(pointCoords, extraAttrValues) # Filter out all zero-value points. The offsets of the remaining points are used as particleIds
     attributes = ['position','particleId']
     if arrayLength == 4:
         attributes = [str(extraAttr)] + attributes
-        extraAttrValuesR = []
-        [extraAttrValuesR.append(extraAttrValues[i]*float(extraScalefactor)) for i in particleIds]
-        extraAttrValues = extraAttrValuesR
-        mc.addAttr(mc.particle(q=1,n=1),ln=extraAttr, dt='doubleArray') # Add the extraAttr to the particle object
-        mc.addAttr(mc.particle(q=1,n=1),ln=extraAttr+'0', dt='doubleArray') # Add the extraAttr to the particle object
-        [mc.particle(e=1, at = extraAttr, id=i, fv = v) for i, v in enumerate(extraAttrValues)] # Edit the values corresponding to extraAttrValues for each particle
-    historyLog.write('OUTPUT\tTotal points = {0}\nOUTPUT\tAttributes assigned = {1}\n'.format(str(len(pointCoords)),attributes))
-    historyLog.write('OUTPUT\tNo cache was created for single frame\n')    
-    historyLog.write('{0}\n\n\n'.format((datetime.datetime.now()).strftime("SESSIONEND\tImport completed: %Y-%m-%d %H:%M:%S")))
-    print(datetime.datetime.now()).strftime("// Completed: %Y-%m-%d %H:%M:%S")
+        extraAttrValues = extraAttrValues*float(extraScalefactor)
+        importPointCloud(os.path.split(sourceFiles[0])[1].split('.')[0]+'particle', pointCoords, extraAttr, extraAttrValues, mc) # Create particles with same name as source file, and set the extraAttr values of all particles at once
+    else:
+        importPointCloud(os.path.split(sourceFiles[0])[1].split('.')[0]+'particle', pointCoords, cmds=mc) # Create particles with same name as source file
+    historyLog.record('sessionEnd', result='Import completed, no cache was created for single frame', points=len(pointCoords), removed=zeroPoints if cleanPrompt == 'Remove' else 0, attributes=attributes)
+    print(datetime.datetime.now().strftime("// Completed: %Y-%m-%d %H:%M:%S"))
     print('*** Your point cloud has been imported. Thanks for using Cache Cloud!\n')
     finalPrompt = mc.confirmDialog(title='Done.', message='Your particles have been created.\nThanks for using Cache Cloud!', button=['Close','Heylight.com'], defaultButton='Close', cancelButton='Close', dismissString='Close' )
     if finalPrompt == 'Close':
@@ -591,3 +380,4 @@ elif importChoice == 'Single':
     else: pass
 elif surePrompt == False:
     finalPrompt = mc.confirmDialog(title='Exit', message='Thanks for using Cache Cloud anyway!', button=['Close'], defaultButton='Close', cancelButton='Close', dismissString='Close' )     
+historyLog.close() # Write out whatever is still buffered, whichever way the session ended
@@ -0,0 +1,43 @@
+"""
+Round trip of the nCache writer: frames written with CacheWriter and read back with CacheSequence must hold the same
+ids, count, positions, velocities and extra values as the same frames written as PDC files.
+"""
+#----------------------------------------------------------------------------------------------------------------------------
+### Imports
+import numpy as np
+import pytest
+
+from cachecloud import ncache, pdc
+
+frames = (3, 4, 5, 7) # With a gap, like a sequence with a missing frame
+
+#----------------------------------------------------------------------------------------------------------------------------
+### Define functions
+# Arguments of pdc.writePdc for a frame: points, ids, extra attribute, velocities, and an empty frame among them
+def frameArrays(frame):
+    rng = np.random.default_rng(frame)
+    pointsTotal = 0 if frame == 4 else 50 + 10 * frame
+    pointCoords = rng.normal(size=(pointsTotal, 3))
+    particleIds = np.sort(rng.choice(10 * pointsTotal + 1, pointsTotal, replace=False))
+    return pointCoords, particleIds, 'radiusPP', rng.random(pointsTotal), 2.0, rng.normal(size=(pointsTotal, 3))
+
+@pytest.mark.parametrize('cacheFormat', ncache.cacheFormats)
+@pytest.mark.parametrize('cacheType', ncache.cacheTypes)
+def test_roundTrip(tmp_path, cacheFormat, cacheType):
+    with ncache.CacheWriter(str(tmp_path), 'pShape1', 'film', cacheType, cacheFormat, 'radiusPP', velocity=True) as writer:
+        for frame in frames:
+            writer.write(frame, *frameArrays(frame))
+    cacheSequence = ncache.CacheSequence(str(tmp_path / 'pShape1.xml'))
+    assert cacheSequence.frames() == list(frames)
+    for frame in frames:
+        pdcPath = str(tmp_path / pdc.pdcFileName('pShape1', pdc.frameTick(frame, 'film')))
+        pdc.writePdc(pdcPath, *frameArrays(frame))
+        pdcFile = pdc.PdcFile(pdcPath)
+        channels = cacheSequence[frame]
+        assert np.array_equal(channels['pShape1_id'], pdcFile['particleId'])
+        assert np.array_equal(channels['pShape1_count'], [pdcFile.particlesTotal])
+        assert np.allclose(channels['pShape1_position'], pdcFile['position'], rtol=1e-6, atol=1e-6) # Stored as floats
+        assert np.allclose(channels['pShape1_velocity'], pdcFile['velocity'], rtol=1e-6, atol=1e-6)
+        assert np.array_equal(channels['pShape1_radiusPP'], pdcFile['radiusPP'])
+        pdcFile.close()
+    cacheSequence.close()